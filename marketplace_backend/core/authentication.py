@@ -0,0 +1,76 @@
+import time
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+# User fields signed into every token, so read-mostly views need no user row
+USER_CLAIMS = ("email", "username", "is_staff", "is_superuser")
+
+
+def revoked_key(user_id):
+    return f"jwt-revoked:{user_id}"
+
+
+def revocations_shared():
+    """Whether revocations reach every process, i.e. the default cache is not per process."""
+    return not isinstance(caches["default"], (LocMemCache, DummyCache))
+
+
+def revoke_tokens(user_id):
+    """
+    Reject the claims of every token issued to the user before now.
+
+    The mark only has to outlive the tokens it rejects, so it expires with
+    the refresh token lifetime.
+    """
+    cache.set(revoked_key(user_id), time.time(), int(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds()))
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """
+    Refresh token carrying the user's USER_CLAIMS and sign-in time, which
+    are copied into every access token made from it.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim in USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        token["auth_time"] = token.current_time.timestamp()
+        return token
+
+
+class ClaimsUser(TokenUser):
+    """User built from the token's claims instead of a database row."""
+
+    @property
+    def email(self):
+        return self.token.get("email", "")
+
+
+class ClaimsJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    JWT authentication that trusts the signed user claims instead of
+    loading the user. Tokens signed in before a revoke_tokens() call for
+    their user are refused. Tokens without claims, and every token while
+    the default cache is per process (so a revocation in one worker would
+    go unseen by the others), fall back to the database lookup.
+    """
+
+    def get_user(self, validated_token):
+        if "auth_time" not in validated_token or not revocations_shared():
+            return JWTAuthentication.get_user(self, validated_token)
+
+        user = ClaimsUser(validated_token)
+        revoked_at = cache.get(revoked_key(user.id))
+        if revoked_at is not None and validated_token["auth_time"] < revoked_at:
+            raise AuthenticationFailed("Token has been revoked.", code="token_revoked")
+        return user
@@ -11,4 +11,16 @@ class CustomUser(AbstractUser):
     REQUIRED_FIELDS = ["username"]
 
     def __str__(self):
-        return self.email
\ No newline at end of file
+        return self.email
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        # check_password() saves a rehashed password without setting a new one
+        rehash_only = self._password is None and set(kwargs.get("update_fields") or ()) == {"password"}
+        super().save(*args, **kwargs)
+        # Tokens carry the user's email and staff flags, so changes revoke them
+        update_fields = kwargs.get("update_fields")
+        if not adding and not rehash_only and not (update_fields and set(update_fields) <= {"last_login"}):
+            from core.authentication import revoke_tokens
+
+            revoke_tokens(self.pk)
\ No newline at end of file
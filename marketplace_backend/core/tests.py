@@ -1,3 +1,83 @@
-from django.test import TestCase
+import tempfile
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.throttling import STORES
+
+User = get_user_model()
+
+# Claims are only trusted with a cache every process shares
+SHARED_CACHE = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": f"{tempfile.gettempdir()}/marketplace-test-cache",
+    },
+}
+
+
+@override_settings(CACHES=SHARED_CACHE)
+class ClaimsAuthenticationTests(TestCase):
+    """Read-mostly views trust the token's claims until the user changes."""
+
+    def setUp(self):
+        cache.clear()
+        STORES["local"].clear()
+        self.user = User.objects.create_user(email="buyer@example.com", username="buyer", password="secret-pw")
+        self.client = APIClient()
+        self.sign_in()
+
+    def sign_in(self):
+        response = self.client.post(reverse("signin"), {"email": "buyer@example.com", "password": "secret-pw"})
+        self.assertEqual(response.status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+    def test_claims_need_no_user_lookup(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("user_is_logged_in"))
+        self.assertEqual(response.data["email"], "buyer@example.com")
+
+    def test_user_change_revokes_tokens(self):
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get(reverse("user_is_admin")).status_code, 401)
+
+    def test_password_rehash_on_sign_in_keeps_the_new_token(self):
+        User.objects.filter(pk=self.user.pk).update(password=make_password("secret-pw", hasher="pbkdf2_sha1"))
+        self.sign_in()
+        self.assertEqual(self.client.get(reverse("user_is_logged_in")).status_code, 200)
+
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+    def test_per_process_cache_falls_back_to_user_lookup(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("user_is_logged_in"))
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(THROTTLE_RATES={"auth": "2/minute"})
+class ThrottlingTests(TestCase):
+    def setUp(self):
+        STORES["local"].clear()
+
+    def test_sign_in_attempts_are_limited_per_ip(self):
+        client = APIClient()
+        credentials = {"email": "nobody@example.com", "password": "x"}
+        for _ in range(2):
+            self.assertEqual(client.post(reverse("signin"), credentials).status_code, 404)
+        with self.assertNumQueries(0):
+            response = client.post(reverse("signin"), credentials)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "30")
+
+    def test_forwarded_for_header_does_not_reset_the_limit(self):
+        client = APIClient()
+        credentials = {"email": "nobody@example.com", "password": "x"}
+        statuses = [
+            client.post(reverse("signin"), credentials, HTTP_X_FORWARDED_FOR=f"203.0.113.{i}").status_code
+            for i in range(3)
+        ]
+        self.assertEqual(statuses, [404, 404, 429])
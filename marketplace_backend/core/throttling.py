@@ -0,0 +1,141 @@
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.throttling import BaseThrottle
+
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+LOCAL_MAX_KEYS = 10000  # buckets kept per process before full ones are dropped
+
+
+def parse_rate(rate):
+    """``"10/minute"`` -> (10, 60). None or "" means no limit."""
+    if not rate:
+        return None
+    count, period = rate.split("/")
+    try:
+        return int(count), PERIODS[period.rstrip("s")]
+    except (KeyError, ValueError):
+        raise ImproperlyConfigured(f"Throttle rates look like '10/minute', not {rate!r}.")
+
+
+def refill(state, capacity, per_second, now):
+    """Tokens in a bucket stored as ``(tokens, updated)``, topped up to ``now``."""
+    tokens, updated = state[:2] if state else (capacity, now)
+    return min(capacity, tokens + (now - updated) * per_second)
+
+
+class LocalBuckets:
+    """Token buckets in this process's memory."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}
+
+    def take(self, key, capacity, per_second):
+        now = time.monotonic()
+        with self.lock:
+            tokens = refill(self.buckets.get(key), capacity, per_second, now)
+            wait = 0 if tokens >= 1 else (1 - tokens) / per_second
+            if not wait:
+                tokens -= 1
+            full_at = now + (capacity - tokens) / per_second
+            self.buckets[key] = (tokens, now, full_at)
+            if len(self.buckets) > LOCAL_MAX_KEYS:
+                # A bucket that has refilled is the same as no bucket
+                self.buckets = {key: state for key, state in self.buckets.items() if state[2] > now}
+        return wait
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+
+
+class CacheBuckets:
+    """
+    Token buckets in the Django cache, shared by every process using it.
+    The read and write are not atomic, so concurrent requests from one
+    client may occasionally both get the last token.
+    """
+
+    def take(self, key, capacity, per_second):
+        now = time.time()
+        key = f"throttle:{key}"
+        tokens = refill(cache.get(key), capacity, per_second, now)
+        wait = 0 if tokens >= 1 else (1 - tokens) / per_second
+        if not wait:
+            tokens -= 1
+        cache.set(key, (tokens, now), math.ceil((capacity - tokens) / per_second) + 1)
+        return wait
+
+
+STORES = {"local": LocalBuckets(), "cache": CacheBuckets()}
+
+
+def get_store():
+    try:
+        return STORES[settings.THROTTLE_STORE]
+    except KeyError:
+        raise ImproperlyConfigured(f"THROTTLE_STORE must be one of {', '.join(STORES)}, not {settings.THROTTLE_STORE!r}.")
+
+
+class BucketThrottle(BaseThrottle):
+    """
+    Token bucket per endpoint class (``scope``) and client: the user when
+    signed in, otherwise the IP address. THROTTLE_RATES[scope] is both the
+    burst size and the steady rate.
+    """
+
+    scope = None
+
+    def allow_request(self, request, view):
+        self.wait_seconds = throttle_wait(request, self.scope, self.get_ident(request))
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
+
+
+def throttle_wait(request, scope, ident):
+    """Take a token for ``scope``; returns 0, or the seconds until one is free."""
+    rate = parse_rate(settings.THROTTLE_RATES.get(scope))
+    if rate is None:
+        return 0
+    user = getattr(request, "user", None)
+    client = f"user:{user.pk}" if user is not None and user.is_authenticated else f"ip:{ident}"
+    count, period = rate
+    return get_store().take(f"{scope}:{client}", count, count / period)
+
+
+class AuthThrottle(BucketThrottle):
+    """Sign-up and sign-in, which hash a password on every attempt."""
+
+    scope = "auth"
+
+
+class AIThrottle(BucketThrottle):
+    """Endpoints that call the description model."""
+
+    scope = "ai"
+
+
+class SearchThrottle(BucketThrottle):
+    """Product listings, counted only when they carry a ``search`` query."""
+
+    scope = "search"
+
+    def allow_request(self, request, view):
+        if not request.query_params.get("search"):
+            return True
+        return super().allow_request(request, view)
+
+
+class CheckoutThrottle(BucketThrottle):
+    """Payment initialisation and verification, which call Paystack."""
+
+    scope = "checkout"
@@ -1,14 +1,16 @@
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, throttle_classes
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import make_password
-from rest_framework_simplejwt.tokens import RefreshToken
-from django.contrib.auth import authenticate
 from rest_framework import status
 
+from core.authentication import ClaimsRefreshToken
+from core.throttling import AuthThrottle
+
 User = get_user_model()
 
 @api_view(["POST"])
+@throttle_classes([AuthThrottle])
 def signup_view(request):
     email = request.data.get("email")
     username = request.data.get("username")
@@ -34,6 +36,7 @@ def signup_view(request):
 
 
 @api_view(["POST"])
+@throttle_classes([AuthThrottle])
 def signin_view(request):
     email = request.data.get("email")
     password = request.data.get("password")
@@ -41,16 +44,15 @@ def signin_view(request):
     if not email or not password:
         return Response({"error": "Email and password are required."}, status=status.HTTP_400_BAD_REQUEST)
 
-    try:
-        user = User.objects.get(email=email)
-    except User.DoesNotExist:
+    # One lookup serves both the account check and the password check
+    user = User.objects.filter(email=email).first()
+    if user is None:
         return Response({"error": "No account found with this email."}, status=status.HTTP_404_NOT_FOUND)
 
-    user = authenticate(request, email=email, password=password)
-    if user is None:
+    if not user.check_password(password) or not user.is_active:
         return Response({"error": "Incorrect password."}, status=status.HTTP_401_UNAUTHORIZED)
 
-    refresh = RefreshToken.for_user(user)
+    refresh = ClaimsRefreshToken.for_user(user)
 
     return Response({
         "message": "Login successful.",
@@ -1,15 +1,30 @@
 from django.contrib import admin
-from .models import Order, Orderitem, Product, Cart, CartItem, ShippingInfo
+from .models import ArchivedOrder, ArchivedOrderitem, Order, Orderitem, Product, Cart, CartItem, ShippingInfo
+from .rollups import SALE_STATUSES, record_sales
+from .jobs import submit_job
+from .similarity import products_listing, queue_similar_refresh
 
 
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('name', 'category', 'price', 'quantity', 'featured', 'created_at')
-    list_filter = ('category', 'featured', 'created_at')
+    list_filter = ('category', 'featured', 'is_low_stock', 'created_at')
     search_fields = ('name', 'sku', 'category', 'description')
     prepopulated_fields = {'slug': ('name',)}
     ordering = ('-created_at',)
     list_editable = ('featured', 'price', 'quantity')
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change or {'name', 'category', 'description'} & set(form.changed_data):
+            queue_similar_refresh([obj.pk])
+        if 'image' in form.changed_data:
+            submit_job('image_variants', {'product_id': obj.pk}, priority=1)
+
+    def delete_model(self, request, obj):
+        neighbours_of = products_listing([obj.pk])
+        super().delete_model(request, obj)
+        queue_similar_refresh(neighbours_of)
+
 
 class CartItemInline(admin.TabularInline):
     model = CartItem
@@ -43,6 +58,11 @@ class OrderAdmin(admin.ModelAdmin):
     readonly_fields = ("reference", "created_at", "updated_at")
     ordering = ("-created_at",)
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if obj.status in SALE_STATUSES:
+            record_sales([obj.id])
+
 
 @admin.register(Orderitem)
 class OrderItemAdmin(admin.ModelAdmin):
@@ -51,6 +71,28 @@ class OrderItemAdmin(admin.ModelAdmin):
     search_fields = ("order__reference", "product__name")
 
 
+class ArchivedOrderitemInline(admin.TabularInline):
+    model = ArchivedOrderitem
+    extra = 0
+    can_delete = False
+    readonly_fields = ("product", "quantity")
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = ("reference", "user", "total_amount", "status", "created_at", "archived_at")
+    list_filter = ("status", "created_at")
+    search_fields = ("reference", "sku", "user__email")
+    ordering = ("-created_at",)
+    inlines = [ArchivedOrderitemInline]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(ShippingInfo)
 class ShippingInfoAdmin(admin.ModelAdmin):
     list_display = ("user", "first_name", "last_name", "email", "city", "state", "zip_code")
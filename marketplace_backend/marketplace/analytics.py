@@ -0,0 +1,138 @@
+from django.conf import settings
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+
+from marketplace.dashboard import single_flight
+from marketplace.models import DailyProductSales, DailySales, Product, StorefrontEventCount
+
+
+GRANULARITIES = {
+    "day": (TruncDay, "%d %b %Y"),
+    "week": (TruncWeek, "Week of %d %b %Y"),
+    "month": (TruncMonth, "%b %Y"),
+}
+
+DEFAULT_RANGE_DAYS = 365
+MAX_DAILY_POINTS = 366
+
+CATEGORY_COLORS = ["#8884d8", "#82ca9d", "#ffc658", "#ff7c7c", "#00C49F", "#FFBB28", "#FF8042"]
+
+
+def compute_analytics(date_from, date_to, granularity="month", category=None):
+    """
+    Dashboard analytics for the days ``date_from`` to ``date_to`` inclusive.
+
+    Every figure is read from the daily rollups, filtered on their indexed
+    day column. With a ``category`` the metrics are summed from that
+    category's order lines, so revenue excludes tax and shipping and an
+    order with several matching products is counted once per product.
+    """
+    days = {"day__gte": date_from, "day__lte": date_to}
+    product_sales = DailyProductSales.objects.filter(**days)
+    if category:
+        product_sales = product_sales.filter(category=category)
+        sales = product_sales
+    else:
+        sales = DailySales.objects.filter(**days)
+
+    # ---- Key Metrics ----
+    totals = sales.aggregate(total_revenue=Sum("revenue"), total_orders=Sum("orders"))
+    total_revenue = totals["total_revenue"] or 0
+    total_orders = totals["total_orders"] or 0
+
+    average_order_value = (
+        total_revenue / total_orders if total_orders > 0 else 0
+    )
+
+    # ---- Funnel (paid orders per 100 product views) ----
+    events = StorefrontEventCount.objects.filter(**days)
+    if category:
+        events = events.filter(product__category=category)
+    counts = dict(events.values("event").annotate(total=Sum("count")).values_list("event", "total"))
+    funnel = {
+        "product_views": counts.get("product_view", 0),
+        "add_to_cart": counts.get("add_to_cart", 0),
+        "checkout_starts": counts.get("checkout_start", 0),
+        "orders": total_orders,
+    }
+    views = funnel["product_views"]
+    funnel["conversion_rate"] = round(total_orders / views * 100, 2) if views else 0
+
+    # ---- Sales Chart ----
+    trunc, label_format = GRANULARITIES[granularity]
+    periods = (
+        sales.annotate(period=trunc("day"))
+        .values("period")
+        .annotate(sales=Sum("revenue"), orders=Sum("orders"))
+        .order_by("period")
+    )
+
+    sales_data = [
+        {
+            "period": p["period"].isoformat(),
+            "month": p["period"].strftime(label_format),
+            "sales": float(p["sales"]),
+            "orders": p["orders"],
+        }
+        for p in periods
+    ]
+
+    # ---- Category Distribution (Pie Chart) ----
+    category_data = (
+        Product.objects.values("category")
+        .annotate(value=Count("id"))
+        .order_by("-value")
+    )
+
+    category_result = []
+    for idx, c in enumerate(category_data):
+        category_result.append({
+            "name": c["category"].replace("_", " ").title() if c["category"] else "Uncategorized",
+            "value": c["value"],
+            "color": CATEGORY_COLORS[idx % len(CATEGORY_COLORS)],
+        })
+
+    # ---- Top Products ----
+    top_products = (
+        product_sales
+        .values("product__name")
+        .annotate(sold=Sum("units"), revenue=Sum("revenue"))
+        .order_by("-sold")[:5]
+    )
+
+    top_products_data = [
+        {
+            "name": item["product__name"],
+            "sold": item["sold"],
+            "revenue": float(item["revenue"]),
+        }
+        for item in top_products
+    ]
+
+    return {
+        "range": {
+            "from": date_from.isoformat(),
+            "to": date_to.isoformat(),
+            "granularity": granularity,
+            "category": category,
+        },
+        "metrics": {
+            "total_revenue": total_revenue,
+            "total_orders": total_orders,
+            "average_order_value": average_order_value,
+            "conversion_rate": funnel["conversion_rate"],
+        },
+        "funnel": funnel,
+        "sales_data": sales_data,
+        "category_data": category_result,
+        "top_products": top_products_data,
+    }
+
+
+def analytics(date_from, date_to, granularity="month", category=None):
+    """``compute_analytics`` cached per parameter set."""
+    key = f"analytics:{date_from}:{date_to}:{granularity}:{category or 'all'}"
+    return single_flight(
+        key, settings.DASHBOARD_CACHE_TTL,
+        lambda: compute_analytics(date_from, date_to, granularity, category),
+    )
@@ -0,0 +1,78 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Value
+
+from marketplace.models import ArchivedOrder, ArchivedOrderitem, Order, Orderitem
+
+
+ARCHIVABLE_STATUSES = ("delivered", "failed")
+
+ORDER_COLUMNS = ["id", "reference", "sku", "user_id", "total_amount", "status", "cart_code", "created_at", "updated_at"]
+ORDERITEM_COLUMNS = ["id", "order_id", "product_id", "quantity", "unit_price", "line_total"]
+
+HISTORY_COLUMNS = ["id", "reference", "sku", "total_amount", "status", "created_at", "updated_at"]
+
+
+def archive_batch(before, batch_size):
+    """
+    Move one batch of finished orders created before ``before`` into the
+    archive tables. Returns the number of orders moved.
+    """
+    with transaction.atomic():
+        order_ids = list(
+            Order.objects.filter(status__in=ARCHIVABLE_STATUSES, created_at__lt=before)
+            .order_by("id")
+            .select_for_update(skip_locked=True)
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not order_ids:
+            return 0
+
+        ArchivedOrder.objects.bulk_create(
+            ArchivedOrder(**row) for row in Order.objects.filter(id__in=order_ids).values(*ORDER_COLUMNS)
+        )
+        ArchivedOrderitem.objects.bulk_create(
+            ArchivedOrderitem(**row)
+            for row in Orderitem.objects.filter(order_id__in=order_ids).values(*ORDERITEM_COLUMNS)
+        )
+
+        Orderitem.objects.filter(order_id__in=order_ids).delete()
+        Order.objects.filter(id__in=order_ids).delete()
+
+    return len(order_ids)
+
+
+def order_history(orders, archived_orders, columns=HISTORY_COLUMNS, ordering=("-created_at", "-id")):
+    """
+    Combine hot and archived rows (orders by default, or order lines) into
+    one queryset of plain rows with ``columns``, newest first by default,
+    and an ``archived`` flag telling which table each row came from.
+    """
+    hot = orders.annotate(archived=Value(False)).values(*columns, "archived")
+    cold = archived_orders.annotate(archived=Value(True)).values(*columns, "archived")
+    return hot.union(cold, all=True).order_by(*ordering)
+
+
+def attach_orderitems(rows):
+    """
+    Load the order lines for a page of ``order_history`` rows, querying
+    each table only when the page holds orders from it.
+    """
+    rows = list(rows)
+    items = defaultdict(list)
+
+    for archived, model in ((False, Orderitem), (True, ArchivedOrderitem)):
+        order_ids = [row["id"] for row in rows if row["archived"] == archived]
+        if not order_ids:
+            continue
+        lines = model.objects.filter(order_id__in=order_ids).select_related("product").only(
+            "id", "order_id", "quantity", "unit_price", "line_total",
+            "product__id", "product__name", "product__slug", "product__image", "product__staged_image", "product__price",
+        )
+        for line in lines:
+            items[(archived, line.order_id)].append(line)
+
+    for row in rows:
+        row["orderitems"] = items[(row["archived"], row["id"])]
+    return rows
@@ -0,0 +1,66 @@
+import copy
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.http import Http404, QueryDict
+from django.urls import resolve
+
+from marketplace.threads import run_in_thread
+
+logger = logging.getLogger(__name__)
+
+# URL names of the read-only views a batch may call. Views with side
+# effects on GET (verify_payment, exports) are deliberately left out.
+BATCH_VIEWS = {
+    "user_is_logged_in", "user_is_admin",
+    "get_featured_products", "get_all_products", "get_product", "get_product_by_slug",
+    "similar_products", "frequently_bought_together",
+    "get_cart", "check_product_in_cart",
+    "get_user_orders", "get_shipping_address",
+}
+
+
+def sub_request(request, path, query):
+    """A GET for ``path`` carrying the batch request's headers and client address."""
+    sub = copy.copy(request)
+    sub.META = {**request.META, "REQUEST_METHOD": "GET", "PATH_INFO": path, "QUERY_STRING": query}
+    sub.method = "GET"
+    sub.path = sub.path_info = path
+    sub.GET = QueryDict(query)
+    return sub
+
+
+def run_one(request, url):
+    parts = urlsplit(url)
+    try:
+        match = resolve(parts.path)
+    except Http404:
+        return {"status": 404, "body": {"error": "No such endpoint."}}
+    if match.url_name not in BATCH_VIEWS:
+        return {"status": 400, "body": {"error": f"{parts.path} cannot be batched."}}
+
+    sub = sub_request(request, parts.path, parts.query)
+    sub.resolver_match = match
+    try:
+        response = match.func(sub, *match.args, **match.kwargs)
+    except Exception:
+        # One failing view must not take the rest of the batch down with it
+        logger.exception("Batched request to %s failed", url)
+        return {"status": 500, "body": {"error": "Internal server error."}}
+    body = response.data if hasattr(response, "data") else json.loads(response.content or "null")
+    return {"status": response.status_code, "body": body}
+
+
+def run_batch(request, urls, workers):
+    """
+    Call the read views behind ``urls`` (paths with optional query strings)
+    as if each had been requested on its own, and return their statuses and
+    bodies in order. The views only read, so with ``workers`` > 1 they run
+    concurrently on a thread pool.
+    """
+    if workers <= 1 or len(urls) <= 1:
+        return [run_one(request, url) for url in urls]
+    with ThreadPoolExecutor(max_workers=min(workers, len(urls))) as pool:
+        return list(pool.map(lambda url: run_in_thread(run_one, request, url), urls))
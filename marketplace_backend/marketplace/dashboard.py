@@ -0,0 +1,130 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from marketplace.models import ArchivedOrder, DailySales, Order, Product
+
+
+SINGLE_FLIGHT_LOCK_TIMEOUT = 30  # seconds a recomputation may hold the cache lock
+SINGLE_FLIGHT_WAIT = 5  # seconds a waiting request polls for another worker's result
+
+SINGLE_FLIGHT_STRIPES = 64  # in-process locks shared out among all cache keys
+
+LOW_STOCK_LIMIT = 10  # products listed on the dashboard; the rest via low_stock_products/
+
+# A fixed pool, so keys that vary by date range do not pile up a lock each.
+# Reentrant because dashboard stats compute sales totals, whose key may share a stripe.
+_locks = [threading.RLock() for _ in range(SINGLE_FLIGHT_STRIPES)]
+
+
+def _local_lock(key):
+    return _locks[hash(key) % SINGLE_FLIGHT_STRIPES]
+
+
+def single_flight(key, ttl, compute):
+    """
+    Return the cached value for ``key``, computing it on a miss.
+
+    Concurrent misses are coalesced: threads in this process queue on a
+    lock, and workers in other processes wait for whoever took the cache
+    lock, so ``compute`` runs once per expiry rather than once per request.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    with _local_lock(key):
+        value = cache.get(key)
+        if value is not None:
+            return value
+
+        lock_key = f"{key}:lock"
+        if cache.add(lock_key, True, SINGLE_FLIGHT_LOCK_TIMEOUT):
+            try:
+                value = compute()
+                cache.set(key, value, ttl)
+            finally:
+                cache.delete(lock_key)
+            return value
+
+        # Another worker is recomputing; wait briefly for its result.
+        deadline = time.monotonic() + SINGLE_FLIGHT_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            value = cache.get(key)
+            if value is not None:
+                return value
+
+        return compute()
+
+
+def compute_sales_totals():
+    """All-time and 30-day sales totals in one pass over the daily rollups."""
+    today = timezone.localdate()
+    current = Q(day__gt=today - timedelta(days=30))
+    previous = Q(day__gt=today - timedelta(days=60), day__lte=today - timedelta(days=30))
+
+    totals = DailySales.objects.aggregate(
+        total_revenue=Sum("revenue"),
+        total_orders=Sum("orders"),
+        revenue_last_30_days=Sum("revenue", filter=current),
+        revenue_previous_30_days=Sum("revenue", filter=previous),
+    )
+    return {field: value or 0 for field, value in totals.items()}
+
+
+def sales_totals():
+    return single_flight("dashboard:sales_totals", settings.DASHBOARD_CACHE_TTL, compute_sales_totals)
+
+
+def growth_rate(totals):
+    previous = totals["revenue_previous_30_days"]
+    if not previous:
+        return "+0.0%"
+    rate = (totals["revenue_last_30_days"] - previous) / previous * 100
+    return f"{rate:+.1f}%"
+
+
+def compute_dashboard_stats():
+    sales = sales_totals()
+
+    # Order counts by status in a single conditional aggregate
+    orders = Order.objects.aggregate(
+        total=Count("id"),
+        pending=Count("id", filter=Q(status="pending")),
+        awaiting_shipment=Count("id", filter=Q(status="success")),
+        shipped=Count("id", filter=Q(status="shipped")),
+    )
+
+    # Products below their own minimumStock, read from the partial index
+    low_stock = Product.objects.filter(is_low_stock=True)
+    low_stock_products = low_stock.order_by("quantity", "id").values(
+        "id", "name", "category", "quantity", "minimumStock"
+    )[:LOW_STOCK_LIMIT]
+
+    recent_orders = (
+        Order.objects.order_by("-created_at")
+        .values("id", "sku", "total_amount", "status", "created_at")[:5]
+    )
+
+    return {
+        "total_products": Product.objects.count(),
+        "total_orders": orders["total"] + ArchivedOrder.objects.count(),
+        "pending_orders": orders["pending"],
+        "awaiting_shipment": orders["awaiting_shipment"],
+        "shipped_orders": orders["shipped"],
+        "total_revenue": float(sales["total_revenue"]),
+        "growth_rate": growth_rate(sales),
+        "low_stock_count": low_stock.count(),
+        "low_stock_products": list(low_stock_products),
+        "recent_orders": list(recent_orders),
+    }
+
+
+def dashboard_stats():
+    return single_flight("dashboard:stats", settings.DASHBOARD_CACHE_TTL, compute_dashboard_stats)
@@ -0,0 +1,175 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F, Q
+from django.utils import timezone
+
+from marketplace.models import GeneratedDescription, Product
+from marketplace.resilience import BulkheadFull
+from marketplace.similarity import queue_similar_refresh
+
+
+# Bump whenever the prompt wording changes so stale descriptions are not reused.
+PROMPT_VERSION = "v1"
+
+PROMPT = "Write a compelling and concise product description (max 100 words) for '{name}' to be listed on a farmer marketplace. Highlight its freshness, natural quality, and farm-to-table appeal, making it enticing for customers to buy directly from local farmers."
+
+
+def build_prompt(product_name):
+    return PROMPT.format(name=product_name)
+
+
+def normalize_name(product_name):
+    """Case, punctuation and spacing differences map to the same cache entry."""
+    return " ".join(re.sub(r"[^\w\s]", " ", product_name.lower()).split())[:200]
+
+
+def fresh_descriptions():
+    fresh_after = timezone.now() - timedelta(days=settings.DESCRIPTION_CACHE_TTL_DAYS)
+    return GeneratedDescription.objects.filter(prompt_version=PROMPT_VERSION, created_at__gte=fresh_after)
+
+
+def store_description(name_key, model, description):
+    now = timezone.now()
+    key = {"name_key": name_key, "prompt_version": PROMPT_VERSION, "model": model}
+    updated = GeneratedDescription.objects.filter(**key).update(
+        description=description, hits=0, created_at=now, last_used_at=now,
+    )
+    if not updated:
+        try:
+            GeneratedDescription.objects.create(description=description, **key)
+        except IntegrityError:
+            # Generated concurrently for the same name; the other copy is as good.
+            pass
+        evict_descriptions()
+
+
+def evict_descriptions():
+    """Drop expired entries, then the least recently used ones beyond the size limit."""
+    expired_before = timezone.now() - timedelta(days=settings.DESCRIPTION_CACHE_TTL_DAYS)
+    GeneratedDescription.objects.filter(created_at__lt=expired_before).delete()
+
+    stale_ids = list(
+        GeneratedDescription.objects.order_by("-last_used_at", "-id")
+        .values_list("id", flat=True)[settings.DESCRIPTION_CACHE_MAX_ENTRIES:]
+    )
+    if stale_ids:
+        GeneratedDescription.objects.filter(id__in=stale_ids).delete()
+
+
+def cached_description(product_name, backend, regenerate=False):
+    """
+    Return ``(description, cached)`` for a product name.
+
+    A stored description is reused while it is younger than
+    DESCRIPTION_CACHE_TTL_DAYS. Otherwise, or with ``regenerate``, the
+    ``backend`` generates one and its text replaces the entry.
+    """
+    if not regenerate:
+        description = lookup_description(product_name, backend.model)
+        if description is not None:
+            return description, True
+
+    description = backend.generate(build_prompt(product_name)).strip()
+    store_description(normalize_name(product_name), backend.model, description)
+    return description, False
+
+
+def lookup_description(product_name, model):
+    """The fresh cached description for a product name, or None."""
+    entry = (
+        fresh_descriptions().filter(name_key=normalize_name(product_name), model=model)
+        .only("id", "description").first()
+    )
+    if entry is None:
+        return None
+    GeneratedDescription.objects.filter(id=entry.id).update(hits=F("hits") + 1, last_used_at=timezone.now())
+    return entry.description
+
+
+def generate_queued(backend, prompt):
+    """
+    ``backend.generate`` for batch work, which waits for a free model slot
+    instead of failing when interactive requests or other batches hold them.
+    """
+    while True:
+        try:
+            return backend.generate(prompt)
+        except BulkheadFull:
+            continue  # the guard already waited LLM_QUEUE_TIMEOUT for a slot
+
+
+def products_needing_descriptions(ids=None, names=None, overwrite=False):
+    """Products picked by id or exact name (all products when neither is given)."""
+    products = Product.objects.all()
+    if ids or names:
+        products = products.filter(Q(id__in=ids or []) | Q(name__in=names or []))
+    if not overwrite:
+        products = products.filter(description="")
+    return products.order_by("id")
+
+
+def generate_descriptions(products, backend, workers, regenerate=False, batch_size=100, progress=None):
+    """
+    Write AI descriptions onto many products.
+
+    Products are handled ``batch_size`` at a time: cached descriptions are
+    read in one query, the missing ones are generated with at most
+    ``workers`` (and never more than LLM_MAX_CONCURRENCY) model calls in
+    flight, one per distinct name, queueing for model slots, and the
+    batch is saved with a single ``bulk_update``. ``progress(done, total)``
+    is called after each batch. Returns the number of products updated and
+    a ``{product_id: error}`` dict of failures.
+    """
+    model = backend.model
+    product_ids = list(products.values_list("id", flat=True))
+    total = len(product_ids)
+    updated = 0
+    failed = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, settings.LLM_MAX_CONCURRENCY))) as pool:
+        for start in range(0, total, batch_size):
+            batch = list(Product.objects.filter(id__in=product_ids[start:start + batch_size]).order_by("id").only("id", "name"))
+            keys = {product.id: normalize_name(product.name) for product in batch}
+
+            descriptions = {}
+            if not regenerate:
+                hits = fresh_descriptions().filter(name_key__in=set(keys.values()), model=model)
+                descriptions = dict(hits.values_list("name_key", "description"))
+                hits.update(hits=F("hits") + 1, last_used_at=timezone.now())
+
+            # Only the model calls run on the pool; the database stays on this thread.
+            names = {}
+            for product in batch:
+                if keys[product.id] not in descriptions:
+                    names.setdefault(keys[product.id], product.name)
+            futures = {
+                name_key: pool.submit(generate_queued, backend, build_prompt(name))
+                for name_key, name in names.items()
+            }
+            errors = {}
+            for name_key, future in futures.items():
+                try:
+                    descriptions[name_key] = future.result().strip()
+                    store_description(name_key, model, descriptions[name_key])
+                except Exception as e:
+                    errors[name_key] = str(e)
+
+            done = []
+            for product in batch:
+                if keys[product.id] in descriptions:
+                    product.description = descriptions[keys[product.id]]
+                    done.append(product)
+                else:
+                    failed[product.id] = errors[keys[product.id]]
+            Product.objects.bulk_update(done, ["description"])
+            queue_similar_refresh([product.id for product in done])
+            updated += len(done)
+
+            if progress:
+                progress(min(start + batch_size, total), total)
+
+    return updated, failed
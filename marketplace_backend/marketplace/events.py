@@ -0,0 +1,77 @@
+import atexit
+import random
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from marketplace.models import Product, StorefrontEventCount
+from marketplace.rollups import increment
+
+
+EVENT_TYPES = dict(StorefrontEventCount.EVENTS)
+
+
+class EventBuffer:
+    """
+    Per-worker buffer of storefront event counts.
+
+    Events are counted in memory under (day, event, product) and written
+    as one increment per key when the buffer is flushed, so the database
+    sees a handful of writes per interval however busy the storefront is.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.last_flush = time.monotonic()
+
+    def add(self, event, product_id=None, weight=1):
+        key = (timezone.localdate(), event, product_id)
+        with self.lock:
+            self.counts[key] += weight
+            due = (
+                len(self.counts) >= settings.EVENT_BUFFER_MAX_KEYS
+                or time.monotonic() - self.last_flush >= settings.EVENT_FLUSH_INTERVAL
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            counts, self.counts = self.counts, Counter()
+            self.last_flush = time.monotonic()
+        if not counts:
+            return 0
+
+        product_ids = {product_id for day, event, product_id in counts if product_id is not None}
+        known_products = set(Product.objects.filter(id__in=product_ids).values_list("id", flat=True))
+
+        with transaction.atomic():
+            for (day, event, product_id), count in counts.items():
+                if product_id is not None and product_id not in known_products:
+                    continue
+                increment(
+                    StorefrontEventCount, {"day": day, "event": event, "product_id": product_id},
+                    {"count": round(count)}, ("count",),
+                )
+        return len(counts)
+
+
+buffer = EventBuffer()
+atexit.register(buffer.flush)
+
+
+def record_event(event, product_id=None):
+    """
+    Count one storefront event, subject to EVENT_SAMPLE_RATE. Kept events
+    are weighted by the inverse of the rate so the totals stay unbiased.
+    """
+    rate = settings.EVENT_SAMPLE_RATE
+    if rate <= 0 or random.random() >= rate:
+        return False
+    buffer.add(event, product_id, weight=1 / rate)
+    return True
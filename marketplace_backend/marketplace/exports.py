@@ -0,0 +1,99 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from marketplace.archive import order_history
+from marketplace.models import ArchivedOrder, ArchivedOrderitem, Order, Orderitem
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FORMATS = ("csv", "jsonl")
+
+# Column name -> ORM lookup, relative to the exported model.
+ORDER_COLUMNS = {
+    "id": "id",
+    "sku": "sku",
+    "reference": "reference",
+    "email": "user__email",
+    "status": "status",
+    "total_amount": "total_amount",
+    "created_at": "created_at",
+    "updated_at": "updated_at",
+}
+
+ORDERITEM_COLUMNS = {
+    "order_id": "order_id",
+    "order_sku": "order__sku",
+    "order_status": "order__status",
+    "order_created_at": "order__created_at",
+    "product_id": "product_id",
+    "product_sku": "product__sku",
+    "product_name": "product__name",
+    "quantity": "quantity",
+    "unit_price": "unit_price",
+    "line_total": "line_total",
+}
+
+# Kind -> (hot model, archived model, columns, lookup prefix for order fields, row order)
+EXPORTS = {
+    "orders": (Order, ArchivedOrder, ORDER_COLUMNS, "", ("id",)),
+    "lines": (Orderitem, ArchivedOrderitem, ORDERITEM_COLUMNS, "order__", ("order_id", "product_id")),
+}
+
+
+def export_rows(kind="orders", status=None, date_from=None, date_to=None, sku=None):
+    """
+    Return the column names and a lazy row iterator for an export.
+
+    Hot and archived orders are read together through order_history, with
+    an ``archived`` column telling them apart. Rows are plain tuples read
+    through a server-side cursor, so memory use stays flat no matter how
+    many orders match.
+    """
+    model, archived_model, columns, prefix, ordering = EXPORTS[kind]
+    filters = {}
+    if status and status != "all":
+        filters[f"{prefix}status"] = status
+    if date_from:
+        filters[f"{prefix}created_at__date__gte"] = date_from
+    if date_to:
+        filters[f"{prefix}created_at__date__lte"] = date_to
+    if sku:
+        filters[f"{prefix}sku__iexact"] = sku.strip()
+
+    lookups = list(columns.values())
+    history = order_history(
+        model.objects.filter(**filters), archived_model.objects.filter(**filters), lookups, ordering,
+    )
+    rows = (
+        tuple(row[lookup] for lookup in lookups) + (row["archived"],)
+        for row in history.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    return [*columns, "archived"], rows
+
+
+class Echo:
+    """File-like object whose write() hands back the value instead of buffering it."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(columns, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_jsonl(columns, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + "\n"
+
+
+def stream_export(export_format, columns, rows):
+    if export_format == "jsonl":
+        return stream_jsonl(columns, rows)
+    return stream_csv(columns, rows)
@@ -0,0 +1,116 @@
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from marketplace.models import DailyProductSales, Product, RestockSuggestion
+
+
+HISTORY_DAYS = 56  # eight full weeks, so every weekday is seen eight times
+HORIZON_DAYS = 14  # how far ahead demand is forecast and restocked for
+SMOOTHING = 0.15  # weight of the most recent day in the exponential moving average
+SEASONALITY_SHRINK = 0.5  # pulls noisy weekday factors towards 1
+
+
+def load_sales_matrix(product_ids, end, days=HISTORY_DAYS):
+    """
+    Units sold per product per day as a (products x days) array, read from
+    the daily rollups in one query. The last column is ``end``.
+
+    The query filters on the date range only; passing every product id to
+    it would send the whole catalogue as query parameters. Rollups for
+    products not in ``product_ids`` are dropped while indexing.
+    """
+    start = end - timedelta(days=days - 1)
+    row_of = {product_id: row for row, product_id in enumerate(product_ids)}
+
+    sales = np.array(
+        DailyProductSales.objects.filter(day__gte=start, day__lte=end).values_list("product_id", "day", "units"),
+        dtype=object,
+    ).reshape(-1, 3)
+
+    matrix = np.zeros((len(product_ids), days))
+    if len(sales):
+        rows = np.fromiter((row_of.get(product_id, -1) for product_id in sales[:, 0]), dtype=np.intp, count=len(sales))
+        cols = np.fromiter(((day - start).days for day in sales[:, 1]), dtype=np.intp, count=len(sales))
+        known = rows >= 0
+        matrix[rows[known], cols[known]] = sales[known, 2].astype(float)
+    return matrix
+
+
+def forecast(sales, start_weekday, stock, minimum_stock, horizon=HORIZON_DAYS):
+    """
+    Forecast demand for every product at once.
+
+    ``sales`` is a (products x days) array whose first column falls on
+    ``start_weekday`` (Monday is 0). Returns per-product arrays of daily
+    velocity, units forecast over ``horizon``, days until stock runs out
+    (``inf`` when it does not) and suggested restock quantity.
+    """
+    products, days = sales.shape
+
+    # Exponential moving average, most recent day weighted highest
+    weights = SMOOTHING * (1 - SMOOTHING) ** np.arange(days - 1, -1, -1)
+    velocity = sales @ (weights / weights.sum())
+
+    # Weekday seasonality: each weekday's mean relative to the overall mean
+    weekdays = (start_weekday + np.arange(days)) % 7
+    one_hot = np.eye(7)[weekdays]
+    weekday_mean = (sales @ one_hot) / one_hot.sum(axis=0)
+    overall_mean = sales.mean(axis=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        seasonal = np.where(overall_mean > 0, weekday_mean / overall_mean, 1.0)
+    seasonal = 1 + SEASONALITY_SHRINK * (seasonal - 1)
+
+    upcoming = (start_weekday + days + np.arange(horizon)) % 7
+    daily_forecast = velocity[:, None] * seasonal[:, upcoming]
+    forecast_units = daily_forecast.sum(axis=1)
+
+    # First forecast day on which cumulative demand exceeds stock (with slack
+    # for rounding, so 2/day against 10 in stock runs out on day 5, not 6)
+    cumulative = np.cumsum(daily_forecast, axis=1)
+    runs_out = cumulative >= stock[:, None] - 1e-9
+    with np.errstate(divide="ignore", invalid="ignore"):
+        beyond_horizon = np.where(velocity > 0, stock / velocity, np.inf)
+    days_until_stockout = np.where(runs_out.any(axis=1), runs_out.argmax(axis=1) + 1, beyond_horizon)
+    days_until_stockout = np.where(stock <= 0, 0, days_until_stockout)
+
+    suggested = np.ceil(np.maximum(forecast_units + minimum_stock - stock, 0))
+
+    return velocity, forecast_units, days_until_stockout, suggested
+
+
+def refresh_restock_suggestions(horizon=HORIZON_DAYS):
+    """Recompute and store restock suggestions for the whole catalogue."""
+    catalogue = np.array(Product.objects.order_by("id").values_list("id", "quantity", "minimumStock"), dtype=float).reshape(-1, 3)
+    if not len(catalogue):
+        return 0
+
+    product_ids = catalogue[:, 0].astype(int).tolist()
+    end = timezone.localdate() - timedelta(days=1)  # last complete day
+    start = end - timedelta(days=HISTORY_DAYS - 1)
+
+    sales = load_sales_matrix(product_ids, end)
+    velocity, forecast_units, days_until_stockout, suggested = forecast(
+        sales, start.weekday(), catalogue[:, 1], catalogue[:, 2], horizon,
+    )
+
+    computed_at = timezone.now()
+    suggestions = [
+        RestockSuggestion(
+            product_id=product_id,
+            daily_velocity=round(float(velocity[i]), 3),
+            forecast_units=round(float(forecast_units[i]), 3),
+            days_until_stockout=None if np.isinf(days_until_stockout[i]) else round(float(days_until_stockout[i]), 1),
+            suggested_quantity=int(suggested[i]),
+            computed_at=computed_at,
+        )
+        for i, product_id in enumerate(product_ids)
+    ]
+
+    with transaction.atomic():
+        RestockSuggestion.objects.all().delete()
+        RestockSuggestion.objects.bulk_create(suggestions, batch_size=1000)
+
+    return len(suggestions)
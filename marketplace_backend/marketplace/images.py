@@ -0,0 +1,217 @@
+import hashlib
+from io import BytesIO
+
+import requests
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from marketplace.media import get_media_backend, image_name, image_url
+from marketplace.models import ImageAsset, Product, StagedImage
+
+
+# Formats accepted for upload, as detected from the file's own header, and their extensions
+UPLOAD_FORMATS = {"JPEG": "jpg", "PNG": "png"}
+MIN_UPLOAD_SIDE = 64
+MAX_UPLOAD_PIXELS = 40_000_000
+
+
+# Widths (px) of the resized copies of each product image; none is wider than the original.
+VARIANT_WIDTHS = (160, 320, 640, 1024)
+
+VARIANT_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+DOWNLOAD_TIMEOUT = 15
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def inspect_upload(upload):
+    """
+    Check an uploaded image and return ``(format, width, height, sha256)``.
+
+    Pillow reads only the header to find the real format and size, so
+    nothing is decoded, whatever the client claimed the file was. The
+    hash is computed over the upload's chunks as they stream past.
+    Raises InvalidImage.
+    """
+    upload.seek(0)
+    try:
+        with Image.open(upload) as image:
+            image_format, (width, height) = image.format, image.size
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise InvalidImage("The file is not a readable image.")
+
+    if image_format not in UPLOAD_FORMATS:
+        raise InvalidImage("Only .jpg, .jpeg, and .png image types are allowed.")
+    if min(width, height) < MIN_UPLOAD_SIDE or width * height > MAX_UPLOAD_PIXELS:
+        raise InvalidImage(
+            f"Images must be at least {MIN_UPLOAD_SIDE}px on each side and at most {MAX_UPLOAD_PIXELS // 1_000_000} megapixels."
+        )
+
+    digest = hashlib.sha256()
+    upload.seek(0)
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    return image_format, width, height, digest.hexdigest()
+
+
+def find_stored_image(sha256):
+    """The already stored image holding these bytes, or None when they are new."""
+    stored = ImageAsset.objects.filter(sha256=sha256).values_list("image", flat=True).first()
+    return Product._meta.get_field("image").to_python(stored) if stored else None
+
+
+def stage_upload(upload, image_info):
+    """Keep an upload checked by inspect_upload in the database for the worker to upload."""
+    image_format, width, height, sha256 = image_info
+    upload.seek(0)
+    return StagedImage.objects.create(
+        data=upload.read(), format=image_format, width=width, height=height, sha256=sha256,
+    )
+
+
+def upload_staged(staged):
+    """
+    The value for Product.image of a staged upload: the stored image with
+    the same bytes, otherwise a new upload to the media backend, recorded
+    under its hash for later uploads to reuse.
+    """
+    stored = find_stored_image(staged.sha256)
+    if stored:
+        return stored.get_prep_value()
+    extension = UPLOAD_FORMATS[staged.format]
+    stored = get_media_backend().upload(ContentFile(bytes(staged.data), name=f"upload.{extension}"), extension)
+    ImageAsset.objects.get_or_create(
+        sha256=staged.sha256,
+        defaults={"image": stored, "format": staged.format, "width": staged.width, "height": staged.height},
+    )
+    return stored
+
+
+def read_original(product):
+    """The original image bytes: the copy in media storage when present, otherwise from its URL."""
+    name = image_name(product.image)
+    if default_storage.exists(name):
+        with default_storage.open(name) as original:
+            return original.read()
+    response = requests.get(image_url(product), timeout=DOWNLOAD_TIMEOUT)
+    response.raise_for_status()
+    return response.content
+
+
+def variant_widths(width):
+    """Variant widths for an original ``width`` px wide; all of them when it is unknown."""
+    if width is None:
+        return list(VARIANT_WIDTHS)
+    widths = [w for w in VARIANT_WIDTHS if w < width]
+    return widths + [min(width, VARIANT_WIDTHS[-1])]
+
+
+def original_width(product):
+    """Width of the product's image as recorded at upload, or None."""
+    stored = product.image.get_prep_value() if hasattr(product.image, "get_prep_value") else product.image
+    return ImageAsset.objects.filter(image=stored).values_list("width", flat=True).first()
+
+
+def resize(original):
+    """
+    Yield ``(width, format, bytes)`` for each variant width and format.
+    Large JPEGs are decoded at a reduced scale that still covers the
+    widest variant, which is much cheaper than a full decode.
+    """
+    image = Image.open(BytesIO(original))
+    image.draft("RGB", (VARIANT_WIDTHS[-1], VARIANT_WIDTHS[-1]))
+    image = ImageOps.exif_transpose(image)
+
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        flattened = Image.new("RGB", image.size, "white")
+        flattened.paste(image, mask=image.getchannel("A"))
+        image = flattened
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+
+    for width in reversed(variant_widths(image.width)):
+        height = max(1, round(width * image.height / image.width))
+        image = image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        for extension, (image_format, options) in VARIANT_FORMATS.items():
+            buffer = BytesIO()
+            image.save(buffer, image_format, **options)
+            yield width, extension, buffer.getvalue()
+
+
+def transformed_variants(backend, image, widths):
+    return {
+        extension: {str(width): backend.variant_url(image, width, extension) for width in widths}
+        for extension in VARIANT_FORMATS
+    }
+
+
+def rendered_variants(product):
+    """Resize the original with Pillow into media storage (local backend)."""
+    original = read_original(product)
+    # Names change with the image, so cached copies of old variants are never served.
+    digest = hashlib.sha256(original).hexdigest()[:12]
+
+    variants = {extension: {} for extension in VARIANT_FORMATS}
+    for width, extension, data in resize(original):
+        name = f"product_images/variants/{product.id}/{digest}-{width}.{extension}"
+        default_storage.delete(name)
+        variants[extension][str(width)] = default_storage.url(default_storage.save(name, ContentFile(data)))
+    return variants
+
+
+def generate_variants(product):
+    """
+    Make resized WebP and JPEG copies of a product's image through the
+    media backend and record them in ``image_variants`` as
+    {format: {width: url}}: Cloudinary transformation URLs, rendered
+    eagerly, or files rendered here for the local backend.
+    """
+    backend = get_media_backend()
+    if not product.image:
+        variants = {}
+    elif backend.transforms:
+        widths = variant_widths(original_width(product))
+        backend.prepare_variants(product.image, widths, VARIANT_FORMATS)
+        variants = transformed_variants(backend, product.image, widths)
+    else:
+        variants = rendered_variants(product)
+
+    backend.delete_variants({
+        extension: {width: url for width, url in urls.items() if url not in variants.get(extension, {}).values()}
+        for extension, urls in product.image_variants.items()
+    })
+    Product.objects.filter(id=product.id).update(image_variants=variants)
+    product.image_variants = variants
+    return variants
+
+
+def variant_srcsets(product, build_url):
+    """
+    {format: "url 160w, url 320w, ..."} for use in <source srcset>. Until
+    the variants job has run, a transforming backend's URLs are built on
+    the fly, so the srcset never waits for the worker. A staged image has
+    no variants yet, so it gets none.
+    """
+    if product.staged_image_id:
+        return {}
+    variants = product.image_variants
+    backend = get_media_backend()
+    if not variants and backend.transforms and product.image:
+        variants = transformed_variants(backend, product.image, VARIANT_WIDTHS)
+    return {
+        extension: ", ".join(
+            f"{build_url(url)} {width}w"
+            for width, url in sorted(urls.items(), key=lambda item: int(item[0]))
+        )
+        for extension, urls in variants.items()
+        if urls
+    }
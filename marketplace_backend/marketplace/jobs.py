@@ -0,0 +1,165 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from marketplace.descriptions import cached_description, generate_descriptions, products_needing_descriptions
+from marketplace.images import generate_variants, upload_staged
+from marketplace.llm import get_backend
+from marketplace.models import GenerationJob, Product, StagedImage
+from marketplace.resilience import ModelUnavailable
+from marketplace.similarity import refresh_similar_products
+
+
+def run_description(job):
+    description, cached = cached_description(
+        job.payload["name"], get_backend(), regenerate=job.payload.get("regenerate", False),
+    )
+    return {"name": job.payload["name"], "description": description, "cached": cached}
+
+
+def run_descriptions(job):
+    payload = job.payload
+    products = products_needing_descriptions(payload.get("ids"), payload.get("names"), payload.get("overwrite", False))
+
+    def progress(done, total):
+        GenerationJob.objects.filter(id=job.id).update(result={"done": done, "total": total}, updated_at=timezone.now())
+
+    updated, failed = generate_descriptions(
+        products, get_backend(), workers=settings.DESCRIPTION_BATCH_WORKERS,
+        regenerate=payload.get("regenerate", False), progress=progress,
+    )
+    return {"updated": updated, "failed": [{"id": pk, "error": error} for pk, error in failed.items()]}
+
+
+def run_similar_products(job):
+    return {"refreshed": refresh_similar_products(job.payload["product_ids"])}
+
+
+def run_image_variants(job):
+    product = Product.objects.filter(id=job.payload["product_id"]).only("id", "image", "image_variants").first()
+    if product is None:
+        return {"variants": {}}
+    return {"variants": generate_variants(product)}
+
+
+def run_upload_image(job):
+    """
+    Move a staged upload to the media backend, point the product at the
+    stored image and make its variants.
+    """
+    staged_id = job.payload["staged_id"]
+    product = Product.objects.filter(id=job.payload["product_id"], staged_image_id=staged_id).only(
+        "id", "image", "staged_image", "image_variants",
+    ).first()
+    staged = StagedImage.objects.filter(id=staged_id).first()
+    if product is None or staged is None:
+        # The product was deleted or has a newer upload with its own job.
+        StagedImage.objects.filter(id=staged_id).delete()
+        return {"image": None}
+
+    stored = upload_staged(staged)
+    if not Product.objects.filter(id=product.id, staged_image_id=staged_id).update(image=stored, staged_image=None):
+        return {"image": None}  # replaced by a newer upload while this one ran
+    staged.delete()
+
+    product.image = Product._meta.get_field("image").to_python(stored)
+    product.staged_image = None
+    generate_variants(product)
+    return {"image": stored}
+
+
+def queue_image_jobs(product):
+    """Queue the background work for a product's new image."""
+    if product.staged_image_id:
+        submit_job("upload_image", {"product_id": product.id, "staged_id": str(product.staged_image_id)}, priority=2)
+    elif product.image:
+        submit_job("image_variants", {"product_id": product.id}, priority=1)
+
+
+JOB_HANDLERS = {
+    "description": run_description,
+    "descriptions": run_descriptions,
+    "image_variants": run_image_variants,
+    "similar_products": run_similar_products,
+    "upload_image": run_upload_image,
+}
+
+
+def submit_job(kind, payload, priority=0, user=None):
+    return GenerationJob.objects.create(kind=kind, payload=payload, priority=priority, user=user)
+
+
+def claim_jobs(limit):
+    """
+    Mark up to ``limit`` due jobs as running and return them, highest
+    priority first. Rows locked by another worker are skipped, so several
+    workers can share the queue.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        job_ids = list(
+            GenerationJob.objects.filter(status="queued", run_after__lte=now)
+            .order_by("-priority", "run_after")
+            .select_for_update(skip_locked=True)
+            .values_list("id", flat=True)[:limit]
+        )
+        GenerationJob.objects.filter(id__in=job_ids).update(status="running", started_at=now, updated_at=now)
+    return list(GenerationJob.objects.filter(id__in=job_ids).order_by("-priority", "run_after"))
+
+
+def heartbeat_jobs(job_ids):
+    """Mark running jobs as alive, so requeue_stale_jobs leaves them alone."""
+    return GenerationJob.objects.filter(id__in=job_ids, status="running").update(updated_at=timezone.now())
+
+
+def requeue_stale_jobs():
+    """
+    Put back running jobs whose worker has stopped sending heartbeats. The
+    lost run counts as an attempt, so a job that keeps killing its worker
+    fails after GENERATION_JOB_MAX_ATTEMPTS instead of coming back forever.
+    Returns the number of jobs requeued.
+    """
+    now = timezone.now()
+    stale = GenerationJob.objects.filter(
+        status="running", updated_at__lt=now - timedelta(seconds=settings.GENERATION_JOB_STALE_AFTER),
+    )
+    stale.filter(attempts__gte=settings.GENERATION_JOB_MAX_ATTEMPTS - 1).update(
+        status="failed", attempts=F("attempts") + 1, finished_at=now, error="The worker running this job stopped.",
+        updated_at=now,
+    )
+    return stale.update(status="queued", attempts=F("attempts") + 1, updated_at=now)
+
+
+def run_job(job):
+    """
+    Run one claimed job. A failed attempt is retried with exponential
+    backoff (or after the model's Retry-After) until
+    GENERATION_JOB_MAX_ATTEMPTS, then the job is marked failed.
+    """
+    job.attempts += 1
+    try:
+        result = JOB_HANDLERS[job.kind](job)
+    except Exception as e:
+        now = timezone.now()
+        if job.attempts < settings.GENERATION_JOB_MAX_ATTEMPTS:
+            delay = settings.GENERATION_JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+            if isinstance(e, ModelUnavailable):
+                delay = max(delay, e.retry_after)
+            job.status = "queued"
+            job.run_after = now + timedelta(seconds=delay)
+        else:
+            job.status = "failed"
+            job.finished_at = now
+        job.error = str(e)
+        job.save(update_fields=["attempts", "status", "run_after", "finished_at", "error", "updated_at"])
+        return False
+
+    job.status = "succeeded"
+    job.result = result
+    job.error = ""
+    job.finished_at = timezone.now()
+    job.save(update_fields=["attempts", "status", "result", "error", "finished_at", "updated_at"])
+    return True
@@ -0,0 +1,190 @@
+import asyncio
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from marketplace.resilience import ModelGuard
+
+
+class LLMBackend:
+    """
+    A text generation model. The SDK client is built on first use and then
+    shared by every request in the process, so its HTTP connection pool is
+    reused and importing the app costs nothing.
+    """
+
+    name = None
+
+    def __init__(self):
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        raise NotImplementedError
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self.create_client()
+        return self._client
+
+    def create_client(self):
+        raise NotImplementedError
+
+    def generate(self, prompt):
+        """The full completion for ``prompt``."""
+        raise NotImplementedError
+
+    async def stream(self, prompt):
+        """Async iterator over chunks of the completion as they arrive."""
+        raise NotImplementedError
+        yield
+
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+
+    @property
+    def model(self):
+        return settings.GEMINI_MODEL
+
+    def create_client(self):
+        from google import genai
+        from google.genai import types
+
+        return genai.Client(
+            api_key=settings.GEMINI_API_KEY,
+            http_options=types.HttpOptions(timeout=int(settings.LLM_TIMEOUT * 1000)),
+        )
+
+    def generate(self, prompt):
+        return self.client.models.generate_content(model=self.model, contents=prompt).text
+
+    async def stream(self, prompt):
+        chunks = await self.client.aio.models.generate_content_stream(model=self.model, contents=prompt)
+        async for chunk in chunks:
+            if chunk.text:
+                yield chunk.text
+
+
+class OpenAIBackend(LLMBackend):
+    name = "openai"
+
+    def __init__(self):
+        super().__init__()
+        self._async_client = None
+
+    @property
+    def model(self):
+        return settings.OPENAI_MODEL
+
+    def create_client(self):
+        from openai import OpenAI
+
+        return OpenAI(api_key=settings.OPENAI_API_KEY, timeout=settings.LLM_TIMEOUT, max_retries=0)
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            with self._lock:
+                if self._async_client is None:
+                    from openai import AsyncOpenAI
+
+                    self._async_client = AsyncOpenAI(
+                        api_key=settings.OPENAI_API_KEY, timeout=settings.LLM_TIMEOUT, max_retries=0,
+                    )
+        return self._async_client
+
+    def messages(self, prompt):
+        return [{"role": "user", "content": prompt}]
+
+    def generate(self, prompt):
+        response = self.client.chat.completions.create(model=self.model, messages=self.messages(prompt))
+        return response.choices[0].message.content
+
+    async def stream(self, prompt):
+        chunks = await self.async_client.chat.completions.create(
+            model=self.model, messages=self.messages(prompt), stream=True,
+        )
+        async for chunk in chunks:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class StubBackend(LLMBackend):
+    """
+    Offline backend for tests, development and load tests. The text is
+    derived from the prompt alone, and LLM_STUB_DELAY simulates latency.
+    """
+
+    name = "stub"
+
+    PHRASES = [
+        "Harvested at peak ripeness",
+        "Grown without shortcuts on a local family farm",
+        "Picked and packed the same week",
+        "Naturally full of flavour",
+    ]
+
+    @property
+    def model(self):
+        return "stub"
+
+    def create_client(self):
+        return None
+
+    def text(self, prompt):
+        digest = int(hashlib.sha256(prompt.encode()).hexdigest(), 16)
+        subject = prompt.split("'")[1] if prompt.count("'") >= 2 else "this product"
+        return (
+            f"{self.PHRASES[digest % len(self.PHRASES)]}, our {subject} travels straight "
+            "from the farmer to your table, fresh, natural and full of goodness."
+        )
+
+    def generate(self, prompt):
+        if settings.LLM_STUB_DELAY > settings.LLM_TIMEOUT:
+            time.sleep(settings.LLM_TIMEOUT)
+            raise TimeoutError("Stub model call timed out")
+        time.sleep(settings.LLM_STUB_DELAY)
+        return self.text(prompt)
+
+    async def stream(self, prompt):
+        # The delay is spread over the chunks without blocking the event loop
+        if settings.LLM_STUB_DELAY > settings.LLM_TIMEOUT:
+            await asyncio.sleep(settings.LLM_TIMEOUT)
+            raise TimeoutError("Stub model call timed out")
+        words = self.text(prompt).split(" ")
+        for i, word in enumerate(words):
+            await asyncio.sleep(settings.LLM_STUB_DELAY / len(words))
+            yield word if i == len(words) - 1 else word + " "
+
+
+BACKENDS = {backend.name: backend for backend in (GeminiBackend, OpenAIBackend, StubBackend)}
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend():
+    """
+    The process-wide instance of the backend named by LLM_BACKEND, wrapped
+    in a ModelGuard so every call shares one bulkhead and circuit breaker.
+    """
+    name = settings.LLM_BACKEND
+    if name not in _backends:
+        if name not in BACKENDS:
+            raise ImproperlyConfigured(f"LLM_BACKEND must be one of {', '.join(BACKENDS)}, not {name!r}.")
+        with _backends_lock:
+            if name not in _backends:
+                _backends[name] = ModelGuard(BACKENDS[name]())
+    return _backends[name]
+
+
+def backend_metrics():
+    return [guard.metrics() for guard in _backends.values()]
@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from marketplace.archive import ARCHIVABLE_STATUSES, archive_batch
+from marketplace.models import Order
+
+
+class Command(BaseCommand):
+    help = "Move old delivered and failed orders into the archive tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=settings.ORDER_ARCHIVE_AFTER_DAYS,
+            help="Archive orders created more than this many days ago",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--dry-run", action="store_true", help="Only report how many orders would move")
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options["days"])
+
+        if options["dry_run"]:
+            count = Order.objects.filter(status__in=ARCHIVABLE_STATUSES, created_at__lt=before).count()
+            self.stdout.write(f"{count} orders would be archived")
+            return
+
+        total = 0
+        while True:
+            moved = archive_batch(before, options["batch_size"])
+            if not moved:
+                break
+            total += moved
+            self.stdout.write(f"Archived {total} orders so far")
+
+        self.stdout.write(self.style.SUCCESS(f"Archived {total} orders created before {before:%Y-%m-%d}"))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from marketplace.exports import EXPORT_FORMATS, EXPORTS, export_rows, stream_export
+
+
+class Command(BaseCommand):
+    help = "Stream orders or order lines to a CSV or JSON lines file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--kind", choices=list(EXPORTS), default="orders")
+        parser.add_argument("--file-type", choices=EXPORT_FORMATS, default="csv")
+        parser.add_argument("--status", help="Only export orders with this status")
+        parser.add_argument("--from", dest="date_from", help="First order date to include (YYYY-MM-DD)")
+        parser.add_argument("--to", dest="date_to", help="Last order date to include (YYYY-MM-DD)")
+        parser.add_argument("--sku", help="Only export the order with this SKU")
+        parser.add_argument("--output", help="File to write to (defaults to stdout)")
+
+    def handle(self, *args, **options):
+        dates = {}
+        for option in ("date_from", "date_to"):
+            value = options[option]
+            dates[option] = parse_date(value) if value else None
+            if value and dates[option] is None:
+                raise CommandError(f"{value!r} is not a date (YYYY-MM-DD).")
+
+        columns, rows = export_rows(
+            options["kind"],
+            status=options["status"],
+            sku=options["sku"],
+            **dates,
+        )
+        chunks = stream_export(options["file_type"], columns, rows)
+
+        if options["output"]:
+            with open(options["output"], "w", newline="") as output:
+                output.writelines(chunks)
+            self.stdout.write(self.style.SUCCESS(f"Exported {options['kind']} to {options['output']}"))
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from marketplace.forecasting import HORIZON_DAYS, refresh_restock_suggestions
+
+
+class Command(BaseCommand):
+    help = "Forecast product demand and store restock suggestions (run nightly)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--horizon", type=int, default=HORIZON_DAYS, help="Days of demand to restock for")
+
+    def handle(self, *args, **options):
+        count = refresh_restock_suggestions(options["horizon"])
+        self.stdout.write(self.style.SUCCESS(f"Stored restock suggestions for {count} products"))
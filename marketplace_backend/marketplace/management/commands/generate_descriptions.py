@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from marketplace.descriptions import generate_descriptions, products_needing_descriptions
+from marketplace.llm import get_backend
+
+
+class Command(BaseCommand):
+    help = "Generate AI descriptions for products, by default every product that has none"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ids", type=int, nargs="+", default=[], help="Only these product ids")
+        parser.add_argument("--names", nargs="+", default=[], help="Only products with these exact names")
+        parser.add_argument("--overwrite", action="store_true", help="Replace existing descriptions too")
+        parser.add_argument("--regenerate", action="store_true", help="Ignore cached descriptions")
+        parser.add_argument("--workers", type=int, default=settings.DESCRIPTION_BATCH_WORKERS)
+        parser.add_argument("--batch-size", type=int, default=100)
+
+    def handle(self, *args, **options):
+        products = products_needing_descriptions(options["ids"], options["names"], options["overwrite"])
+
+        def progress(done, total):
+            self.stdout.write(f"{done}/{total} products processed")
+
+        updated, failed = generate_descriptions(
+            products, get_backend(),
+            workers=options["workers"], regenerate=options["regenerate"],
+            batch_size=options["batch_size"], progress=progress,
+        )
+
+        for product_id, error in failed.items():
+            self.stderr.write(f"Product {product_id}: {error}")
+        self.stdout.write(self.style.SUCCESS(f"Updated {updated} products, {len(failed)} failed"))
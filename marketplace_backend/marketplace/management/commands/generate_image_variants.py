@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from marketplace.images import generate_variants
+from marketplace.models import Product
+
+
+class Command(BaseCommand):
+    help = "Create resized WebP/JPEG variants for product images that do not have them yet"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Regenerate variants for every product image")
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image__isnull=True).exclude(image="").order_by("id")
+        if not options["all"]:
+            products = products.filter(image_variants={})
+        products = products.only("id", "image", "image_variants")
+
+        total = products.count()
+        done = failed = 0
+        for product in products.iterator(chunk_size=100):
+            try:
+                generate_variants(product)
+                done += 1
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"Product {product.id}: {e}")
+            if (done + failed) % 25 == 0:
+                self.stdout.write(f"{done + failed}/{total} images processed")
+
+        self.stdout.write(self.style.SUCCESS(f"Created variants for {done} products, {failed} failed"))
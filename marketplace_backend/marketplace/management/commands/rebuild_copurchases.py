@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from marketplace.rollups import COPURCHASE_CHUNK_LINES, rebuild_copurchases
+
+
+class Command(BaseCommand):
+    help = "Recompute the frequently-bought-together counts from order history"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-lines", type=int, default=COPURCHASE_CHUNK_LINES, help="Order lines read per step")
+
+    def handle(self, *args, **options):
+        pairs = rebuild_copurchases(options["chunk_lines"])
+        self.stdout.write(self.style.SUCCESS(f"Stored {pairs} co-purchased product pairs"))
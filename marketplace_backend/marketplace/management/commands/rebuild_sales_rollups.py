@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from marketplace.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily sales rollups used by the analytics dashboard from order history"
+
+    def handle(self, *args, **options):
+        order_count = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt sales rollups from {order_count} paid orders"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from marketplace.similarity import TOP_K, rebuild_similar_products
+
+
+class Command(BaseCommand):
+    help = "Rebuild the similar products index from product names, categories and descriptions"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--k", type=int, default=TOP_K, help="Neighbours stored per product")
+
+    def handle(self, *args, **options):
+        count = rebuild_similar_products(options["k"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed similar products for {count} products"))
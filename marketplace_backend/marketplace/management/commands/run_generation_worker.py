@@ -0,0 +1,54 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from marketplace.jobs import claim_jobs, heartbeat_jobs, requeue_stale_jobs, run_job
+from marketplace.threads import run_in_thread
+
+HEARTBEAT_INTERVAL = 30  # seconds between heartbeats for the jobs this worker is running
+
+
+class Command(BaseCommand):
+    help = "Process queued AI generation jobs until stopped"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=settings.GENERATION_JOB_WORKERS, help="Jobs run at once")
+        parser.add_argument("--poll-interval", type=float, default=2, help="Seconds to sleep when the queue is empty")
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is empty")
+
+    def handle(self, *args, **options):
+        workers = options["workers"]
+        running = {}  # future -> job id
+        last_stale_check = last_heartbeat = 0
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                close_old_connections()
+                if time.monotonic() - last_stale_check > 60:
+                    requeued = requeue_stale_jobs()
+                    if requeued:
+                        self.stdout.write(f"Requeued {requeued} stale jobs")
+                    last_stale_check = time.monotonic()
+                if running and time.monotonic() - last_heartbeat > HEARTBEAT_INTERVAL:
+                    heartbeat_jobs(running.values())
+                    last_heartbeat = time.monotonic()
+
+                jobs = claim_jobs(workers - len(running)) if len(running) < workers else []
+                for job in jobs:
+                    self.stdout.write(f"Running {job}")
+                    running[pool.submit(run_in_thread, run_job, job)] = job.id
+
+                if running:
+                    done, _ = wait(running, timeout=options["poll_interval"], return_when=FIRST_COMPLETED)
+                    for future in done:
+                        del running[future]
+                        future.result()
+                elif options["once"]:
+                    break
+                elif not jobs:
+                    time.sleep(options["poll_interval"])
+
+        self.stdout.write(self.style.SUCCESS("Generation queue is empty"))
@@ -0,0 +1,102 @@
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+
+def image_name(image):
+    """Storage name of a product image, e.g. product_images/apples.jpg."""
+    return f"{image.public_id}.{image.format}" if image.format else image.public_id
+
+
+# Extension Cloudinary uses for each variant format
+CLOUDINARY_FORMATS = {"webp": "webp", "jpeg": "jpg"}
+
+
+class CloudinaryMedia:
+    """
+    Product images on Cloudinary, as stored by the CloudinaryField.
+    Variants are Cloudinary transformation URLs, resized and converted by
+    Cloudinary's CDN, so nothing but the original is stored.
+    """
+
+    name = "cloudinary"
+    transforms = True
+
+    def upload(self, upload, extension):
+        """Upload a validated file and return the value to store in Product.image."""
+        from cloudinary import uploader
+
+        upload.seek(0)
+        return uploader.upload_resource(upload, type="upload", resource_type="image").get_prep_value()
+
+    def url(self, image):
+        return image.url
+
+    def variant_url(self, image, width, extension):
+        return image.build_url(width=width, crop="limit", quality="auto", format=CLOUDINARY_FORMATS[extension])
+
+    def prepare_variants(self, image, widths, extensions):
+        """Have Cloudinary render the variants now rather than for the first visitor."""
+        from cloudinary import uploader
+
+        eager = [
+            {"width": width, "crop": "limit", "quality": "auto", "format": CLOUDINARY_FORMATS[extension]}
+            for width in widths for extension in extensions
+        ]
+        uploader.explicit(image.public_id, type="upload", eager=eager, eager_async=True)
+
+    def delete_variants(self, variants):
+        pass  # derived images belong to the original on Cloudinary
+
+
+class LocalMedia:
+    """
+    Product images kept in MEDIA_ROOT and served from MEDIA_URL, for
+    development, tests and benchmarks without network access.
+    """
+
+    name = "local"
+    transforms = False
+
+    def upload(self, upload, extension):
+        upload.seek(0)
+        return default_storage.save(f"product_images/{uuid.uuid4().hex}.{extension}", upload)
+
+    def url(self, image):
+        return default_storage.url(image_name(image))
+
+    def delete_variants(self, variants):
+        # Local variants are recorded by URL, which is MEDIA_URL + storage name
+        for urls in variants.values():
+            for url in urls.values():
+                default_storage.delete(url.removeprefix(settings.MEDIA_URL))
+
+
+MEDIA_BACKENDS = {backend.name: backend for backend in (CloudinaryMedia, LocalMedia)}
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_media_backend():
+    """The process-wide instance of the media backend named by MEDIA_BACKEND."""
+    name = settings.MEDIA_BACKEND
+    if name not in _backends:
+        if name not in MEDIA_BACKENDS:
+            raise ImproperlyConfigured(f"MEDIA_BACKEND must be one of {', '.join(MEDIA_BACKENDS)}, not {name!r}.")
+        with _backends_lock:
+            _backends.setdefault(name, MEDIA_BACKENDS[name]())
+    return _backends[name]
+
+
+def image_url(product):
+    """URL of a product's image, the staged copy until the worker has uploaded it, or None."""
+    if product.staged_image_id:
+        return reverse("get_staged_image", args=[product.staged_image_id])
+    if product.image:
+        return get_media_backend().url(product.image)
+    return None
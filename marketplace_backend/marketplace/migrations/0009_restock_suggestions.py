@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-19 16:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0008_orderitem_price_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RestockSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('daily_velocity', models.FloatField(default=0)),
+                ('forecast_units', models.FloatField(default=0)),
+                ('days_until_stockout', models.FloatField(blank=True, null=True)),
+                ('suggested_quantity', models.PositiveIntegerField(default=0)),
+                ('computed_at', models.DateTimeField()),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='restock_suggestion', to='marketplace.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['days_until_stockout'], name='marketplace_days_un_c1eaa7_idx')],
+            },
+        ),
+    ]
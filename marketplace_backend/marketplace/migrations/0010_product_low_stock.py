@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-19 16:08
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_low_stock(apps, schema_editor):
+    Product = apps.get_model('marketplace', 'Product')
+    Product.objects.filter(quantity__lt=F('minimumStock')).update(is_low_stock=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0009_restock_suggestions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='is_low_stock',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_low_stock', True)), fields=['quantity', 'id'], name='product_low_stock_idx'),
+        ),
+        migrations.RunPython(backfill_low_stock, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-19 16:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0010_product_low_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StorefrontEventCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('event', models.CharField(choices=[('product_view', 'Product view'), ('add_to_cart', 'Add to cart'), ('checkout_start', 'Checkout start')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='event_counts', to='marketplace.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'event', 'product'), name='unique_storefront_event_count', nulls_distinct=False)],
+            },
+        ),
+    ]
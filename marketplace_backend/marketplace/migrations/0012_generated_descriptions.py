@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-19 16:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0011_storefront_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeneratedDescription',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name_key', models.CharField(max_length=200)),
+                ('prompt_version', models.CharField(max_length=20)),
+                ('model', models.CharField(max_length=100)),
+                ('description', models.TextField()),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('name_key', 'prompt_version', 'model'), name='unique_generated_description')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 16:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0017_image_assets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generationjob',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
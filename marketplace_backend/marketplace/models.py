@@ -1,10 +1,26 @@
 import uuid
 from django.db import models
 from django.conf import settings
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.lookups import LessThan
+from django.utils import timezone
 from django.utils.text import slugify
 from cloudinary.models import CloudinaryField
 
 
+class ProductQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        # Keep is_low_stock in step with set-based stock changes, in the same UPDATE
+        if "quantity" in kwargs or "minimumStock" in kwargs:
+            quantity = kwargs.get("quantity", F("quantity"))
+            minimum = kwargs.get("minimumStock", F("minimumStock"))
+            kwargs["is_low_stock"] = Case(
+                When(LessThan(quantity, minimum), then=Value(True)),
+                default=Value(False),
+            )
+        return super().update(**kwargs)
+
+
 class Product(models.Model):
     CATEGORIES = (
         ("vegetables", "Vegetables"),
@@ -27,9 +43,24 @@ class Product(models.Model):
     quantity = models.PositiveIntegerField(default=0)
     featured = models.BooleanField(default=False)
     minimumStock = models.PositiveIntegerField(default=10)
+    # quantity < minimumStock, maintained on every save and queryset update
+    is_low_stock = models.BooleanField(default=False, editable=False)
     image = CloudinaryField("image", blank=True, null=True)
+    # New image held in the database, shown until the worker has uploaded it to image
+    staged_image = models.ForeignKey(
+        "StagedImage", on_delete=models.SET_NULL, related_name="+", blank=True, null=True, editable=False,
+    )
+    # Resized copies of image, {format: {width: storage name}}, made by marketplace.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["quantity", "id"], condition=Q(is_low_stock=True), name="product_low_stock_idx"),
+        ]
+
 
     def save(self, *args, **kwargs):
         # Always regenerate slug when name changes
@@ -40,6 +71,13 @@ class Product(models.Model):
             slug = f"{base_slug}-{counter}"
             counter += 1
         self.slug = slug
+
+        if self.quantity is not None and self.minimumStock is not None:
+            self.is_low_stock = int(self.quantity) < int(self.minimumStock)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"quantity", "minimumStock"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "is_low_stock"}
+
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -74,12 +112,21 @@ class Order(models.Model):
         ("shipped", "Shipped"),
         ("delivered", "Delivered")
     )
+    # Statuses an order may move to from each status in bulk fulfilment.
+    STATUS_TRANSITIONS = {
+        "pending": ("success", "failed"),
+        "success": ("shipped",),
+        "shipped": ("delivered",),
+        "delivered": (),
+        "failed": (),
+    }
     reference = models.CharField(max_length=64, unique=True, blank=True, null=True)
     sku = models.CharField(max_length=100, unique=True, blank=True, null=True)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="orders", blank=True, null=True)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     status = models.CharField(max_length=20, choices=STATUS, default="pending")
     cart_code = models.CharField(max_length=100, unique=True, blank=True, null=True)
+    counted_in_rollups = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -104,12 +151,248 @@ class Orderitem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="orderitems")
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="orderitem")
     quantity = models.IntegerField(default=1)
+    # Price snapshot taken when the order is created
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    line_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["product", "quantity", "line_total"], name="orderitem_product_sales_idx"),
+        ]
 
     def __str__(self):
         return f"{self.quantity} x {self.product.name} in order {self.order.reference}"
 
 
 
+class ArchivedOrder(models.Model):
+    """
+    Cold copy of a delivered or failed order, moved out of Order by the
+    archive_orders command. Keeps the original order id.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    reference = models.CharField(max_length=64, blank=True, null=True)
+    sku = models.CharField(max_length=100, unique=True, blank=True, null=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="archived_orders", blank=True, null=True)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    status = models.CharField(max_length=20, choices=Order.STATUS)
+    cart_code = models.CharField(max_length=100, blank=True, null=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-created_at"]),
+            models.Index(fields=["-created_at"]),
+        ]
+
+    def __str__(self):
+        return f"An archived order with reference {self.reference}"
+
+
+class ArchivedOrderitem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name="orderitems")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="archived_orderitem")
+    quantity = models.IntegerField(default=1)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    line_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product.name} in archived order {self.order.reference}"
+
+
+class DailySales(models.Model):
+    """Paid orders and revenue per day, maintained by marketplace.rollups."""
+    day = models.DateField(unique=True)
+    orders = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"Sales on {self.day}"
+
+
+class DailyProductSales(models.Model):
+    """Units and revenue per day, product and category, maintained by marketplace.rollups."""
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="daily_sales")
+    category = models.CharField(max_length=50, blank=True, null=True)
+    orders = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["day", "product"], name="unique_daily_product_sales"),
+        ]
+        indexes = [
+            models.Index(fields=["category", "day"]),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} sales on {self.day}"
+
+
+class CoPurchase(models.Model):
+    """Paid orders that contained both products, stored once in each direction."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="copurchases")
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["product", "other"], name="unique_copurchase"),
+        ]
+        indexes = [
+            models.Index(fields=["product", "-orders"], name="copurchase_top_idx"),
+        ]
+
+
+class RestockSuggestion(models.Model):
+    """Nightly demand forecast for a product, written by the forecast_restock command."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name="restock_suggestion")
+    daily_velocity = models.FloatField(default=0)
+    forecast_units = models.FloatField(default=0)
+    days_until_stockout = models.FloatField(blank=True, null=True)
+    suggested_quantity = models.PositiveIntegerField(default=0)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["days_until_stockout"]),
+        ]
+
+    def __str__(self):
+        return f"Restock suggestion for {self.product.name}"
+
+
+class SimilarProduct(models.Model):
+    """One of a product's precomputed nearest neighbours by text similarity."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="similar_products")
+    similar = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    rank = models.PositiveSmallIntegerField()  # 0 is the closest
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["product", "rank"], name="unique_similar_product_rank"),
+        ]
+
+
+class StorefrontEventCount(models.Model):
+    """Storefront events per day, event type and product, flushed from marketplace.events buffers."""
+    EVENTS = (
+        ("product_view", "Product view"),
+        ("add_to_cart", "Add to cart"),
+        ("checkout_start", "Checkout start"),
+    )
+
+    day = models.DateField()
+    event = models.CharField(max_length=20, choices=EVENTS)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="event_counts", blank=True, null=True)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "event", "product"], name="unique_storefront_event_count", nulls_distinct=False,
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.count} x {self.event} on {self.day}"
+
+
+class GeneratedDescription(models.Model):
+    """AI product description cached per normalized product name, prompt version and model."""
+    name_key = models.CharField(max_length=200)
+    prompt_version = models.CharField(max_length=20)
+    model = models.CharField(max_length=100)
+    description = models.TextField()
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["name_key", "prompt_version", "model"], name="unique_generated_description"),
+        ]
+
+    def __str__(self):
+        return f"Description for {self.name_key}"
+
+
+class GenerationJob(models.Model):
+    """Background work (AI text, image variants, similar products) queued for the run_generation_worker command."""
+    KINDS = (
+        ("description", "Single description"),
+        ("descriptions", "Product descriptions"),
+        ("image_variants", "Image variants"),
+        ("similar_products", "Similar products refresh"),
+        ("upload_image", "Image upload"),
+    )
+    STATUS = (
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("succeeded", "Succeeded"),
+        ("failed", "Failed"),
+    )
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=20, choices=KINDS)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS, default="queued")
+    priority = models.SmallIntegerField(default=0)  # higher runs first
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    result = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, related_name="generation_jobs", blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)  # heartbeat while running
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-priority", "run_after"], condition=Q(status="queued"), name="generationjob_queue_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} job {self.id} ({self.status})"
+
+
+class ImageAsset(models.Model):
+    """An uploaded image by content hash, so identical uploads reuse the stored copy."""
+    sha256 = models.CharField(max_length=64, unique=True)
+    image = models.CharField(max_length=255)  # stored value of Product.image
+    format = models.CharField(max_length=10)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.image
+
+
+class StagedImage(models.Model):
+    """
+    A checked upload waiting for the worker to send it to the media
+    backend. Kept in the database so web and worker processes need no
+    shared disk.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    data = models.BinaryField()
+    format = models.CharField(max_length=10)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"staged {self.format} {self.id}"
+
+
 class ShippingInfo(models.Model):
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
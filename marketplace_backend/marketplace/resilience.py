@@ -0,0 +1,178 @@
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+
+class ModelUnavailable(Exception):
+    """The model call was refused or failed; callers should answer 503."""
+
+    retry_after = 5
+
+
+class CircuitOpen(ModelUnavailable):
+    pass
+
+
+class BulkheadFull(ModelUnavailable):
+    retry_after = 1
+
+
+@functools.cache
+def timeout_errors():
+    """
+    Exceptions that mean a model call ran out of time: the builtin and
+    the SDKs' own. Imported on first use, like the SDK clients.
+    """
+    import httpx
+    from openai import APITimeoutError
+
+    return (TimeoutError, httpx.TimeoutException, APITimeoutError)
+
+
+class ModelGuard:
+    """
+    Wraps an LLM backend with a process-wide concurrency cap (bulkhead), a
+    circuit breaker and a per-call deadline of LLM_TIMEOUT, and counts
+    what happens. The SDK timeouts apply to each HTTP request; the
+    deadline bounds the whole call, which runs on the guard's own threads.
+    A call past its deadline keeps its slot until it actually returns, so
+    abandoned calls still count against the bulkhead.
+
+    After LLM_BREAKER_FAILURES consecutive failures the circuit opens and
+    every call fails at once for LLM_BREAKER_RESET seconds. Then a single
+    trial call is let through; its outcome closes or reopens the circuit.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(settings.LLM_MAX_CONCURRENCY)
+        self.calls = ThreadPoolExecutor(max_workers=settings.LLM_MAX_CONCURRENCY, thread_name_prefix="llm")
+        self.timeout_errors = timeout_errors()
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_running = False
+        self.counters = dict.fromkeys(
+            ("calls", "succeeded", "failed", "timed_out", "rejected_open", "rejected_busy"), 0,
+        )
+        self.in_flight = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    @property
+    def model(self):
+        return self.backend.model
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def admit(self, wait):
+        """Take a slot, or raise if the circuit is open or the bulkhead is full."""
+        with self.lock:
+            self.counters["calls"] += 1
+            trial = False
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < settings.LLM_BREAKER_RESET:
+                    self.counters["rejected_open"] += 1
+                    raise CircuitOpen("The description service is temporarily unavailable.")
+                self.state = "half_open"
+            if self.state == "half_open":
+                if self.trial_running:
+                    self.counters["rejected_open"] += 1
+                    raise CircuitOpen("The description service is temporarily unavailable.")
+                self.trial_running = trial = True
+
+        acquired = self.slots.acquire(timeout=wait) if wait else self.slots.acquire(blocking=False)
+        if not acquired:
+            with self.lock:
+                self.counters["rejected_busy"] += 1
+                if trial:
+                    self.trial_running = False
+            raise BulkheadFull("Too many descriptions are being generated; try again shortly.")
+
+        with self.lock:
+            self.in_flight += 1
+        return trial, time.monotonic()
+
+    def finish(self, admitted, error=None, completed=True, release=True):
+        trial, started = admitted
+        if release:
+            self.slots.release()
+        elapsed = time.monotonic() - started
+
+        with self.lock:
+            self.in_flight -= 1
+            if trial:
+                self.trial_running = False
+            if not completed:  # caller went away mid-stream; says nothing about the model
+                return
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+
+            if error is None:
+                self.counters["succeeded"] += 1
+                self.failures = 0
+                self.state = "closed"
+                return
+
+            self.counters["timed_out" if isinstance(error, self.timeout_errors) else "failed"] += 1
+            self.failures += 1
+            if trial or self.failures >= settings.LLM_BREAKER_FAILURES:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def generate(self, prompt):
+        admitted = self.admit(wait=settings.LLM_QUEUE_TIMEOUT)
+        call = self.calls.submit(self.backend.generate, prompt)
+        try:
+            text = call.result(timeout=settings.LLM_TIMEOUT)
+        except TimeoutError as e:
+            # The abandoned call frees its slot when it finally returns
+            self.finish(admitted, e, release=False)
+            call.add_done_callback(lambda call: self.slots.release())
+            raise ModelUnavailable("Description generation failed: the model did not answer in time.") from e
+        except Exception as e:
+            self.finish(admitted, e)
+            raise ModelUnavailable(f"Description generation failed: {e}") from e
+        self.finish(admitted)
+        return text
+
+    async def stream(self, prompt):
+        # Waiting for a slot would block the event loop, so streams never queue.
+        admitted = self.admit(wait=0)
+        completed = False
+        try:
+            async with asyncio.timeout(settings.LLM_TIMEOUT):
+                async for text in self.backend.stream(prompt):
+                    yield text
+        except Exception as e:
+            completed = True
+            self.finish(admitted, e)
+            raise ModelUnavailable(f"Description generation failed: {e}") from e
+        else:
+            completed = True
+            self.finish(admitted)
+        finally:
+            if not completed:
+                self.finish(admitted, completed=False)
+
+    def metrics(self):
+        with self.lock:
+            finished = self.counters["succeeded"] + self.counters["failed"] + self.counters["timed_out"]
+            return {
+                "backend": self.backend.name,
+                "model": self.backend.model,
+                "circuit": self.state,
+                "consecutive_failures": self.failures,
+                "in_flight": self.in_flight,
+                "max_concurrency": settings.LLM_MAX_CONCURRENCY,
+                **self.counters,
+                "avg_seconds": round(self.total_seconds / finished, 3) if finished else 0,
+                "max_seconds": round(self.max_seconds, 3),
+            }
@@ -0,0 +1,250 @@
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+import numpy as np
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import TruncDate
+from scipy import sparse
+
+from marketplace.models import (
+    ArchivedOrder, ArchivedOrderitem, CoPurchase, DailyProductSales, DailySales, Order, Orderitem, Product,
+)
+
+
+# Statuses of an order that has been paid for.
+SALE_STATUSES = ("success", "shipped", "delivered")
+
+COPURCHASE_CHUNK_LINES = 20000  # order lines read per step of a co-purchase rebuild
+COPURCHASE_UPSERT_ROWS = 1000  # pairs per INSERT, well under the database's parameter limit
+
+
+def empty_totals():
+    return {"orders": 0, "units": 0, "revenue": Decimal("0")}
+
+
+def product_categories(product_ids):
+    return dict(Product.objects.filter(id__in=product_ids).values_list("id", "category"))
+
+
+def add_to_rollups(day_totals, product_totals):
+    """
+    Add totals to the rollup rows with F() increments, creating rows that
+    do not exist yet.
+    """
+    for day, totals in day_totals.items():
+        increment(DailySales, {"day": day}, totals, ("orders", "revenue"))
+
+    for (day, product_id, category), totals in product_totals.items():
+        increment(
+            DailyProductSales, {"day": day, "product_id": product_id}, totals,
+            ("orders", "units", "revenue"), category=category,
+        )
+
+
+def add_to_copurchases(baskets):
+    """
+    Count each pair of distinct products bought together in ``baskets``
+    (sets of product ids). Every pair is added in one upsert statement
+    rather than an UPDATE (and maybe an INSERT) per pair, as this runs
+    inside the checkout request.
+    """
+    pairs = Counter()
+    for products in baskets:
+        for product_id in products:
+            for other_id in products:
+                if product_id != other_id:
+                    pairs[(product_id, other_id)] += 1
+
+    table = connection.ops.quote_name(CoPurchase._meta.db_table)
+    rows = [(product_id, other_id, orders) for (product_id, other_id), orders in pairs.items()]
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), COPURCHASE_UPSERT_ROWS):
+            chunk = rows[start:start + COPURCHASE_UPSERT_ROWS]
+            cursor.execute(
+                f"INSERT INTO {table} (product_id, other_id, orders) VALUES {', '.join(['(%s, %s, %s)'] * len(chunk))} "
+                f"ON CONFLICT (product_id, other_id) DO UPDATE SET orders = {table}.orders + EXCLUDED.orders",
+                [value for row in chunk for value in row],
+            )
+
+
+def increment(model, key, totals, fields, **defaults):
+    changes = {field: F(field) + totals[field] for field in fields}
+    if model.objects.filter(**key).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**key, **defaults, **{field: totals[field] for field in fields})
+    except IntegrityError:
+        # Another worker created the row first.
+        model.objects.filter(**key).update(**changes)
+
+
+def record_sales(order_ids):
+    """
+    Add paid orders to the daily rollups and co-purchase counts. Orders already counted are
+    ignored, so this is safe to call again for the same orders.
+
+    Orders that later leave a paid status are not subtracted; the
+    rebuild_sales_rollups command resets the rollups from history.
+    """
+    with transaction.atomic():
+        orders = list(
+            Order.objects.select_for_update()
+            .filter(id__in=order_ids, status__in=SALE_STATUSES, counted_in_rollups=False)
+            .annotate(day=TruncDate("created_at"))
+            .values("id", "day", "total_amount")
+        )
+        if not orders:
+            return 0
+
+        day_totals = defaultdict(empty_totals)
+        order_days = {}
+        for order in orders:
+            day_totals[order["day"]]["orders"] += 1
+            day_totals[order["day"]]["revenue"] += order["total_amount"]
+            order_days[order["id"]] = order["day"]
+
+        lines = list(Orderitem.objects.filter(order_id__in=order_days).values(
+            "order_id", "product_id", "quantity", "line_total",
+        ))
+        categories = product_categories({line["product_id"] for line in lines})
+
+        product_totals = defaultdict(empty_totals)
+        baskets = defaultdict(set)
+        for line in lines:
+            baskets[line["order_id"]].add(line["product_id"])
+            totals = product_totals[(order_days[line["order_id"]], line["product_id"], categories.get(line["product_id"]))]
+            totals["orders"] += 1
+            totals["units"] += line["quantity"]
+            totals["revenue"] += line["line_total"]
+
+        add_to_rollups(day_totals, product_totals)
+        add_to_copurchases(baskets.values())
+        Order.objects.filter(id__in=order_days).update(counted_in_rollups=True)
+
+    return len(orders)
+
+
+def rebuild_rollups():
+    """
+    Recompute every rollup row from hot and archived order history.
+    Returns the number of orders counted.
+    """
+    day_totals = defaultdict(empty_totals)
+    product_totals = defaultdict(empty_totals)
+
+    sources = (
+        (Order.objects.filter(status__in=SALE_STATUSES), Orderitem),
+        (ArchivedOrder.objects.filter(status__in=SALE_STATUSES), ArchivedOrderitem),
+    )
+
+    with transaction.atomic():
+        DailySales.objects.all().delete()
+        DailyProductSales.objects.all().delete()
+
+        order_count = 0
+        for orders, line_model in sources:
+            per_day = (
+                orders.annotate(day=TruncDate("created_at"))
+                .values("day")
+                .annotate(orders=Count("id"), revenue=Sum("total_amount"))
+                .order_by()
+            )
+            for row in per_day.iterator():
+                day_totals[row["day"]]["orders"] += row["orders"]
+                day_totals[row["day"]]["revenue"] += row["revenue"]
+                order_count += row["orders"]
+
+            per_product = (
+                line_model.objects.filter(order__status__in=SALE_STATUSES)
+                .annotate(day=TruncDate("order__created_at"))
+                .values("day", "product_id")
+                .annotate(
+                    orders=Count("order_id", distinct=True),
+                    units=Sum("quantity"),
+                    revenue=Sum("line_total"),
+                )
+                .order_by()
+            )
+            for row in per_product.iterator():
+                totals = product_totals[(row["day"], row["product_id"])]
+                totals["orders"] += row["orders"]
+                totals["units"] += row["units"]
+                totals["revenue"] += row["revenue"]
+
+        DailySales.objects.bulk_create(
+            (DailySales(day=day, orders=totals["orders"], revenue=totals["revenue"]) for day, totals in day_totals.items()),
+            batch_size=1000,
+        )
+        categories = product_categories({product_id for day, product_id in product_totals})
+        DailyProductSales.objects.bulk_create(
+            (
+                DailyProductSales(day=day, product_id=product_id, category=categories.get(product_id), **totals)
+                for (day, product_id), totals in product_totals.items()
+            ),
+            batch_size=1000,
+        )
+
+        rebuild_copurchases()
+
+        Order.objects.exclude(status__in=SALE_STATUSES).update(counted_in_rollups=False)
+        Order.objects.filter(status__in=SALE_STATUSES).update(counted_in_rollups=True)
+
+    return order_count
+
+
+def basket_chunks(lines, size):
+    """Group ``(order_id, product_id)`` rows sorted by order into chunks of about ``size`` rows, never splitting an order."""
+    chunk = []
+    for row in lines:
+        if len(chunk) >= size and row[0] != chunk[-1][0]:
+            yield chunk
+            chunk = []
+        chunk.append(row)
+    if chunk:
+        yield chunk
+
+
+def rebuild_copurchases(chunk_lines=COPURCHASE_CHUNK_LINES):
+    """
+    Recompute the co-purchase counts from hot and archived order history.
+
+    Order lines are streamed in chunks; each chunk becomes a sparse
+    order x product incidence matrix B and B.T @ B is added to the running
+    product x product count, so memory holds one chunk plus the sparse
+    totals. Returns the number of product pairs stored.
+    """
+    size = (Product.objects.aggregate(last=Max("id"))["last"] or 0) + 1
+    counts = sparse.csr_matrix((size, size), dtype=np.int64)
+
+    for line_model in (Orderitem, ArchivedOrderitem):
+        lines = (
+            line_model.objects.filter(order__status__in=SALE_STATUSES)
+            .order_by("order_id")
+            .values_list("order_id", "product_id")
+            .iterator(chunk_size=chunk_lines)
+        )
+        for chunk in basket_chunks(lines, chunk_lines):
+            rows = np.array(chunk, dtype=np.int64)
+            order_ids, order_rows = np.unique(rows[:, 0], return_inverse=True)
+            baskets = sparse.csr_matrix(
+                (np.ones(len(rows), dtype=np.int64), (order_rows, rows[:, 1])), shape=(len(order_ids), size),
+            )
+            baskets.data[:] = 1  # a product on two lines of one order counts once
+            counts = counts + baskets.T @ baskets
+
+    counts.setdiag(0)
+    counts.eliminate_zeros()
+    pairs = counts.tocoo()
+
+    with transaction.atomic():
+        CoPurchase.objects.all().delete()
+        CoPurchase.objects.bulk_create(
+            (
+                CoPurchase(product_id=int(product_id), other_id=int(other_id), orders=int(orders))
+                for product_id, other_id, orders in zip(pairs.row, pairs.col, pairs.data)
+            ),
+            batch_size=2000,
+        )
+    return pairs.nnz
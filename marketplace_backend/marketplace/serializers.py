@@ -1,9 +1,12 @@
 from rest_framework import serializers 
-from .models import Cart, CartItem, Order, Orderitem, Product, ShippingInfo 
+from .images import variant_srcsets
+from .media import image_url
+from .models import Cart, CartItem, GenerationJob, Order, Orderitem, Product, RestockSuggestion, ShippingInfo, SimilarProduct 
 
 
 class ProductSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
@@ -11,11 +14,15 @@ class ProductSerializer(serializers.ModelSerializer):
 
     def get_image(self, obj):
         request = self.context.get('request')
-        if obj.image and request:
-            return request.build_absolute_uri(obj.image.url)
-        elif obj.image:
-            return obj.image.url
-        return None
+        url = image_url(obj)
+        if url and request:
+            return request.build_absolute_uri(url)
+        return url
+
+    def get_image_srcset(self, obj):
+        request = self.context.get('request')
+        build_url = request.build_absolute_uri if request else str
+        return variant_srcsets(obj, build_url)
 
 
 class CartItemSerializer(serializers.ModelSerializer):
@@ -52,11 +59,19 @@ class ShippingInfoSerializer(serializers.ModelSerializer):
 
 
 
+class OrderitemProductSerializer(ProductSerializer):
+    """Compact product representation used on order lines."""
+
+    class Meta:
+        model = Product
+        fields = ["id", "name", "slug", "image", "price"]
+
+
 class OrderitemSerializer(serializers.ModelSerializer):
-    product = ProductSerializer(read_only=True)
+    product = OrderitemProductSerializer(read_only=True)
     class Meta:
         model = Orderitem
-        fields = ["id", "product", "quantity"]
+        fields = ["id", "product", "quantity", "unit_price", "line_total"]
 
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -64,4 +79,35 @@ class OrderSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
         fields = ["id", "reference", "sku", "total_amount", "status", "orderitems", "created_at", "updated_at"]
-        
\ No newline at end of file
+
+
+class RestockSuggestionSerializer(serializers.ModelSerializer):
+    product_id = serializers.IntegerField(source="product.id", read_only=True)
+    name = serializers.CharField(source="product.name", read_only=True)
+    sku = serializers.CharField(source="product.sku", read_only=True)
+    quantity = serializers.IntegerField(source="product.quantity", read_only=True)
+    minimumStock = serializers.IntegerField(source="product.minimumStock", read_only=True)
+
+    class Meta:
+        model = RestockSuggestion
+        fields = [
+            "product_id", "name", "sku", "quantity", "minimumStock", "daily_velocity",
+            "forecast_units", "days_until_stockout", "suggested_quantity", "computed_at",
+        ]
+
+
+class SimilarProductSerializer(serializers.ModelSerializer):
+    product = OrderitemProductSerializer(source="similar", read_only=True)
+
+    class Meta:
+        model = SimilarProduct
+        fields = ["product", "score"]
+
+
+class GenerationJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = GenerationJob
+        fields = [
+            "id", "kind", "status", "priority", "attempts", "run_after",
+            "result", "error", "created_at", "started_at", "finished_at",
+        ]
@@ -0,0 +1,200 @@
+import re
+from collections import Counter
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+from scipy import sparse
+
+from marketplace.models import GenerationJob, Product, SimilarProduct
+
+
+TOP_K = 10  # neighbours stored per product
+CHUNK_ROWS = 512  # products scored against the catalogue at a time
+REFRESH_DELAY = 30  # seconds product edits are collected before one refresh runs
+
+# Token weight per field: a word in the name says more than one in the description.
+FIELD_WEIGHTS = {"name": 3, "category": 2, "description": 1}
+
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from in is it its of on or our the this to with you your".split()
+)
+
+
+def tokenize(text):
+    return [word for word in re.findall(r"[a-z0-9]+", (text or "").lower()) if len(word) > 1 and word not in STOP_WORDS]
+
+
+def load_catalogue():
+    """Product ids, in id order, and a weighted token count for each product."""
+    ids = []
+    documents = []
+    for row in Product.objects.order_by("id").values("id", *FIELD_WEIGHTS).iterator(chunk_size=2000):
+        counts = Counter()
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(row[field]):
+                counts[token] += weight
+        ids.append(row["id"])
+        documents.append(counts)
+    return ids, documents
+
+
+def tfidf_matrix(documents):
+    """
+    Sparse (products x vocabulary) TF-IDF matrix with sublinear term
+    frequency and L2-normalised rows, so a row product is a cosine similarity.
+    """
+    vocabulary = {}
+    indptr = [0]
+    indices = []
+    counts = []
+    for document in documents:
+        for token, count in document.items():
+            indices.append(vocabulary.setdefault(token, len(vocabulary)))
+            counts.append(count)
+        indptr.append(len(indices))
+
+    shape = (len(documents), len(vocabulary))
+    tf = sparse.csr_matrix((np.array(counts, dtype=float), indices, indptr), shape=shape)
+    tf.data = 1 + np.log(tf.data)
+
+    document_frequency = np.bincount(tf.indices, minlength=shape[1])
+    idf = np.log((1 + shape[0]) / (1 + document_frequency)) + 1
+    matrix = tf @ sparse.diags(idf)
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return (sparse.diags(1 / norms) @ matrix).tocsr()
+
+
+def nearest_neighbours(matrix, rows, k=TOP_K):
+    """
+    Yield ``(rows, neighbours, scores)`` per chunk of ``rows``: the indices
+    of each row's ``k`` most similar other rows and their scores, best
+    first, ties broken by index.
+    """
+    k = min(k, matrix.shape[0] - 1)
+    for start in range(0, len(rows), CHUNK_ROWS):
+        chunk = np.asarray(rows[start:start + CHUNK_ROWS])
+        if k <= 0:
+            yield chunk, np.empty((len(chunk), 0), dtype=int), np.empty((len(chunk), 0))
+            continue
+
+        scores = (matrix[chunk] @ matrix.T).toarray()
+        scores[np.arange(len(chunk)), chunk] = -1  # a product is not its own neighbour
+
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.lexsort((top, -top_scores))
+        yield chunk, np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+def neighbour_rows(ids, matrix, rows, k):
+    for chunk, neighbours, scores in nearest_neighbours(matrix, rows, k):
+        for row, row_neighbours, row_scores in zip(chunk, neighbours, scores):
+            for rank, (neighbour, score) in enumerate(zip(row_neighbours, row_scores)):
+                if score <= 0:
+                    break
+                yield SimilarProduct(
+                    product_id=ids[row], similar_id=ids[neighbour], rank=rank, score=round(float(score), 4),
+                )
+
+
+def products_listing(product_ids):
+    """Ids of the products that have any of ``product_ids`` among their neighbours."""
+    return set(SimilarProduct.objects.filter(similar_id__in=product_ids).values_list("product_id", flat=True))
+
+
+def queue_similar_refresh(product_ids):
+    """
+    Refresh the neighbours of ``product_ids`` on the generation job queue.
+    Edits made while a refresh is still waiting are merged into it, so a
+    burst of product writes costs one catalogue scan.
+    """
+    product_ids = {int(product_id) for product_id in product_ids}
+    if not product_ids:
+        return None
+    with transaction.atomic():
+        job = GenerationJob.objects.select_for_update().filter(kind="similar_products", status="queued").first()
+        if job is not None:
+            job.payload = {"product_ids": sorted(product_ids.union(job.payload["product_ids"]))}
+            job.save(update_fields=["payload"])
+            return job
+        return GenerationJob.objects.create(
+            kind="similar_products", payload={"product_ids": sorted(product_ids)},
+            run_after=timezone.now() + timedelta(seconds=REFRESH_DELAY),
+        )
+
+
+def save_neighbours(product_ids, neighbours):
+    """
+    Make the stored neighbours of ``product_ids`` match ``neighbours``,
+    writing only the ranks that changed. Changed ranks are upserted on
+    (product, rank), so an overlapping refresh cannot hit the unique
+    constraint.
+    """
+    stored = {
+        (row.product_id, row.rank): row
+        for row in SimilarProduct.objects.filter(product_id__in=product_ids).only("id", "product_id", "similar_id", "rank", "score")
+    }
+    changed = []
+    for row in neighbours:
+        old = stored.pop((row.product_id, row.rank), None)
+        if old is None or (old.similar_id, old.score) != (row.similar_id, row.score):
+            changed.append(row)
+
+    with transaction.atomic():
+        SimilarProduct.objects.filter(id__in=[row.id for row in stored.values()]).delete()
+        SimilarProduct.objects.bulk_create(
+            changed, update_conflicts=True, unique_fields=["product", "rank"], update_fields=["similar", "score"],
+            batch_size=2000,
+        )
+    return len(changed) + len(stored)
+
+
+def rebuild_similar_products(k=TOP_K):
+    """Recompute every product's neighbours from scratch."""
+    ids, documents = load_catalogue()
+    matrix = tfidf_matrix(documents)
+
+    with transaction.atomic():
+        SimilarProduct.objects.all().delete()
+        SimilarProduct.objects.bulk_create(neighbour_rows(ids, matrix, range(len(ids)), k), batch_size=2000)
+    return len(ids)
+
+
+def refresh_similar_products(product_ids, k=TOP_K):
+    """
+    Update the index after ``product_ids`` were created, edited or lost a
+    deleted neighbour. Their own lists are recomputed, along with the lists
+    of any product they now outrank or used to appear in. Scores of
+    untouched pairs keep the IDF weights of the last rebuild until the
+    next full rebuild_similar_products.
+    """
+    ids, documents = load_catalogue()
+    position = {product_id: row for row, product_id in enumerate(ids)}
+    changed = sorted({position[product_id] for product_id in product_ids if product_id in position})
+    if not changed:
+        return 0
+    matrix = tfidf_matrix(documents)
+
+    # Lowest stored score per product; products with fewer than k neighbours take anything
+    cutoff = np.zeros(len(ids))
+    lists = SimilarProduct.objects.values("product_id").annotate(lowest=Min("score"), size=Count("id"))
+    for row in lists.filter(size__gte=k):
+        if row["product_id"] in position:
+            cutoff[position[row["product_id"]]] = row["lowest"]
+
+    best = np.zeros(len(ids))
+    for start in range(0, len(changed), CHUNK_ROWS):
+        scores = (matrix[changed[start:start + CHUNK_ROWS]] @ matrix.T).toarray()
+        best = np.maximum(best, scores.max(axis=0))
+
+    affected = {position[product_id] for product_id in products_listing(product_ids) if product_id in position}
+    affected.update(np.flatnonzero(best > cutoff).tolist())
+    rows = sorted(affected.union(changed))
+
+    save_neighbours([ids[row] for row in rows], neighbour_rows(ids, matrix, rows, k))
+    return len(rows)
@@ -1,3 +1,333 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+import numpy as np
+from PIL import Image
+from rest_framework.test import APIClient
+
+from .archive import archive_batch
+from .forecasting import forecast
+from .jobs import claim_jobs, run_job
+from .models import (
+    ArchivedOrder, ArchivedOrderitem, Cart, CoPurchase, DailyProductSales, DailySales, Order, Orderitem, Product,
+    StagedImage,
+)
+from .rollups import rebuild_rollups, record_sales
+
+User = get_user_model()
+
+
+class OrderListingQueryTests(TestCase):
+    """Order listings must cost the same number of queries whatever the page holds."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(email="admin@example.com", username="admin", password="x", is_staff=True)
+        cls.buyer = User.objects.create_user(email="buyer@example.com", username="buyer", password="x")
+        cls.products = [
+            Product.objects.create(name=f"Product {i}", sku=f"VEG-{i:06d}", price="2.50", quantity=100)
+            for i in range(6)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def create_orders(self, user, count, items_per_order):
+        for _ in range(count):
+            order = Order.objects.create(user=user, total_amount="10.00")
+            Orderitem.objects.bulk_create(
+                Orderitem(order=order, product=product, quantity=2)
+                for product in self.products[:items_per_order]
+            )
+
+    def get_query_count(self, user, url_name):
+        self.client.force_authenticate(user)
+        with self.assertNumQueries(3):  # count, orders, order lines joined to products
+            response = self.client.get(reverse(url_name))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_user_orders_query_count_is_constant(self):
+        self.create_orders(self.buyer, 1, 1)
+        self.get_query_count(self.buyer, "get_user_orders")
+
+        self.create_orders(self.buyer, 4, 6)
+        response = self.get_query_count(self.buyer, "get_user_orders")
+        self.assertEqual(len(response.data["results"]), 5)
+
+    def test_all_orders_query_count_is_constant(self):
+        self.create_orders(self.buyer, 2, 1)
+        self.get_query_count(self.admin, "get_all_orders")
+
+        self.create_orders(self.buyer, 12, 6)
+        response = self.get_query_count(self.admin, "get_all_orders")
+        self.assertEqual(len(response.data["results"]), 10)
+
+    def test_order_lines_use_compact_product(self):
+        self.create_orders(self.buyer, 1, 2)
+        response = self.get_query_count(self.buyer, "get_user_orders")
+
+        line = response.data["results"][0]["orderitems"][0]
+        self.assertEqual(set(line["product"]), {"id", "name", "slug", "image", "price"})
+        self.assertEqual(line["quantity"], 2)
+
+
+@override_settings(LLM_BACKEND="stub", LLM_STUB_DELAY=0)
+class DescriptionGenerationTests(TestCase):
+    """The description endpoint runs offline against the stub backend."""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def generate(self, **data):
+        response = self.client.post(reverse("generate_product_description"), data, format="json")
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_description_is_cached_by_normalized_name(self):
+        first = self.generate(name="Fresh Tomatoes")
+        second = self.generate(name="  fresh tomatoes! ")
+
+        self.assertFalse(first["cached"])
+        self.assertTrue(second["cached"])
+        self.assertEqual(first["description"], second["description"])
+        self.assertIn("Fresh Tomatoes", first["description"])
+
+    def test_regenerate_bypasses_cache(self):
+        self.generate(name="Basmati Rice")
+        self.assertFalse(self.generate(name="Basmati Rice", regenerate=True)["cached"])
+
+    def test_bulk_descriptions_are_queued(self):
+        product = Product.objects.create(name="Kale", price="1.00", quantity=5, description="")
+        self.client.force_authenticate(User.objects.create_user(
+            email="admin@example.com", username="admin", password="x", is_staff=True,
+        ))
+        response = self.client.post(reverse("generate_product_descriptions"), {"ids": [product.id]}, format="json")
+        self.assertEqual((response.status_code, response.data["matched"]), (202, 1))
+
+        for job in claim_jobs(10):
+            run_job(job)
+        product.refresh_from_db()
+        self.assertIn("Kale", product.description)
+
+
+@override_settings(BATCH_WORKERS=1)
+class BatchRequestTests(TestCase):
+    """A batch answers each read request as the view would on its own."""
+
+    def test_batch_runs_read_views_in_order(self):
+        Product.objects.create(name="Carrots", sku="VEG-000001", price="1.00", quantity=5, featured=True)
+        response = APIClient().post(reverse("batch_requests"), {
+            "requests": ["/get_featured_products/", "/user_is_logged_in/", "/verify_payment/abc/"],
+        }, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        featured, logged_in, payment = response.data["responses"]
+        self.assertEqual([product["name"] for product in featured["body"]], ["Carrots"])
+        self.assertEqual(logged_in["status"], 401)
+        self.assertEqual(payment["status"], 400)  # GET with side effects is not batchable
+
+    def test_failing_sub_request_does_not_fail_the_batch(self):
+        Cart.objects.create(cart_code="abc")
+        with self.assertLogs("marketplace.batch", "ERROR"):
+            response = APIClient().post(reverse("batch_requests"), {
+                "requests": ["/check_product_in_cart/?cart_code=abc&product_id=abc", "/get_featured_products/"],
+            }, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([entry["status"] for entry in response.data["responses"]], [500, 200])
+
+
+class BulkOrderStatusTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(
+            email="admin@example.com", username="admin", password="x", is_staff=True,
+        ))
+
+    def update(self, **data):
+        return self.client.post(reverse("bulk_update_order_status"), data, format="json")
+
+    def test_malformed_selectors_are_rejected(self):
+        for data in (
+            {"ids": "12"}, {"skus": [1]}, {"filter": ["pending"]},
+            {"filter": {"from": 5}}, {"filter": {"to": "2026-02-30"}}, {"filter": {"status": ["pending"]}},
+        ):
+            self.assertEqual(self.update(status="shipped", **data).status_code, 400)
+
+    def test_filter_updates_matching_orders_in_place(self):
+        for current in ("pending", "success", "success", "shipped"):
+            Order.objects.create(total_amount="10.00", status=current)
+        response = self.update(status="shipped", filter={"status": "success"})
+        self.assertEqual(response.data["updated"], 2)
+        self.assertEqual(Order.objects.filter(status="shipped").count(), 3)
+        response = self.update(status="shipped", filter={"from": "2000-01-01"})
+        self.assertEqual(response.data["skipped"], 3)
+        self.assertEqual(response.data["invalid"], [{"status": "pending", "count": 1}])
+
+
+@override_settings(MEDIA_BACKEND="local")
+class StagedImageUploadTests(TestCase):
+    """New images are staged in the database and uploaded by the worker."""
+
+    def upload(self, color):
+        buffer = BytesIO()
+        Image.new("RGB", (200, 100), color).save(buffer, "PNG")
+        return SimpleUploadedFile("photo.png", buffer.getvalue(), content_type="image/png")
+
+    def add_product(self, color):
+        data = {"name": "Kale", "description": "Leafy", "price": "1.00", "quantity": 5, "minimumStock": 1, "image": self.upload(color)}
+        return APIClient().post(reverse("add_product"), data, format="multipart").data
+
+    def run_jobs(self):
+        for job in claim_jobs(10):
+            run_job(job)
+
+    def test_product_serves_staged_image_until_uploaded(self):
+        product = self.add_product("red")
+        staged = self.client.get(product["image"])
+        self.assertEqual((staged.status_code, staged["Content-Type"]), (200, "image/png"))
+
+        self.run_jobs()
+        product = Product.objects.get(id=product["id"])
+        self.assertIsNone(product.staged_image_id)
+        self.assertTrue(product.image.public_id.startswith("product_images/"))
+        self.assertEqual(sorted(product.image_variants["webp"]), ["160", "200"])
+        self.assertFalse(StagedImage.objects.exists())
+
+    def test_identical_upload_reuses_stored_image(self):
+        self.add_product("red")
+        self.run_jobs()
+        product = self.add_product("red")
+        self.assertIsNone(product["staged_image"])
+        self.assertIn("/media/product_images/", product["image"])
+
+
+class OrderArchiveTests(TestCase):
+    """Archived orders leave the hot tables but not the order history."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(email="admin@example.com", username="admin", password="x", is_staff=True)
+        cls.buyer = User.objects.create_user(email="buyer@example.com", username="buyer", password="x")
+        cls.product = Product.objects.create(name="Kale", sku="VEG-000001", price="2.50", quantity=100)
+        cls.order = Order.objects.create(user=cls.buyer, sku="ORD-1", total_amount="5.00", status="delivered")
+        Orderitem.objects.create(order=cls.order, product=cls.product, quantity=2, unit_price="2.50", line_total="5.00")
+
+    def setUp(self):
+        # The price changes after the sale; the order keeps what was paid
+        Product.objects.filter(id=self.product.id).update(price="9.99")
+        self.assertEqual(archive_batch(timezone.now() + timedelta(days=1), 100), 1)
+        self.client = APIClient()
+
+    def test_order_and_lines_move_to_archive(self):
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(Orderitem.objects.exists())
+        archived = ArchivedOrder.objects.get(id=self.order.id)
+        self.assertEqual((archived.sku, archived.status, archived.user_id), ("ORD-1", "delivered", self.buyer.id))
+        line = ArchivedOrderitem.objects.get(order_id=self.order.id)
+        self.assertEqual((line.quantity, line.unit_price, line.line_total), (2, Decimal("2.50"), Decimal("5.00")))
+
+    def test_listings_still_show_archived_order(self):
+        for user, url_name in ((self.buyer, "get_user_orders"), (self.admin, "get_all_orders")):
+            self.client.force_authenticate(user)
+            [order] = self.client.get(reverse(url_name)).data["results"]
+            [line] = order["orderitems"]
+            self.assertEqual(order["sku"], "ORD-1")
+            self.assertEqual((line["product"]["name"], line["quantity"], line["unit_price"]), ("Kale", 2, "2.50"))
+
+    def test_exports_include_archived_order(self):
+        self.client.force_authenticate(self.admin)
+        for kind in ("orders", "lines"):
+            response = self.client.get(reverse("export_orders"), {"kind": kind, "file_type": "jsonl"})
+            [row] = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+            self.assertTrue(row["archived"])
+        self.assertEqual((row["order_sku"], row["quantity"], row["unit_price"]), ("ORD-1", 2, "2.50"))
+
+    def test_rebuild_counts_archived_order(self):
+        rebuild_rollups()
+        self.assertEqual(list(DailySales.objects.values_list("orders", "revenue")), [(1, Decimal("5.00"))])
+        self.assertEqual(
+            list(DailyProductSales.objects.values_list("product_id", "units", "revenue")),
+            [(self.product.id, 2, Decimal("5.00"))],
+        )
+
+
+class SalesRollupTests(TestCase):
+    """Rollups kept up as orders are paid match a rebuild from history."""
+
+    def setUp(self):
+        self.kale, self.leeks = (
+            Product.objects.create(name=name, sku=sku, price="2.50", quantity=100)
+            for name, sku in (("Kale", "VEG-000001"), ("Leeks", "VEG-000002"))
+        )
+
+    def create_order(self, status, *lines):
+        order = Order.objects.create(total_amount=sum(quantity * 2 for _, quantity in lines), status=status)
+        for product, quantity in lines:
+            Orderitem.objects.create(order=order, product=product, quantity=quantity, unit_price="2.00", line_total=quantity * 2)
+        return order
+
+    def rollups(self):
+        return (
+            sorted(DailySales.objects.values_list("day", "orders", "revenue")),
+            sorted(DailyProductSales.objects.values_list("day", "product_id", "orders", "units", "revenue")),
+            sorted(CoPurchase.objects.values_list("product_id", "other_id", "orders")),
+        )
+
+    def move(self, order, status):
+        Order.objects.filter(id=order.id).update(status=status)
+        record_sales([order.id])
+
+    def test_incremental_rollups_match_rebuild(self):
+        basket = self.create_order("success", (self.kale, 2), (self.leeks, 1))
+        single = self.create_order("pending", (self.kale, 1))
+        self.create_order("failed", (self.leeks, 4))
+
+        record_sales([basket.id, single.id])
+        record_sales([basket.id])
+        self.move(basket, "shipped")
+        self.move(basket, "delivered")
+        self.move(single, "success")
+
+        incremental = self.rollups()
+        self.assertEqual([row[1:] for row in incremental[0]], [(2, Decimal("8.00"))])
+        self.assertEqual([row[3] for row in incremental[1]], [3, 1])
+
+        self.assertEqual(rebuild_rollups(), 2)
+        self.assertEqual(self.rollups(), incremental)
+
+
+class ForecastTests(SimpleTestCase):
+    """Two weeks of sales starting on a Monday, forecast 14 days ahead."""
+
+    def test_forecast(self):
+        mondays_only = np.zeros(14)
+        mondays_only[[0, 7]] = 7
+        sales = np.array([
+            np.full(14, 2.0),  # steady seller that runs out on day 5
+            np.zeros(14),  # no sales and no stock
+            np.full(14, 1.0),  # enough stock to last past the horizon
+            mondays_only,
+        ])
+        stock = np.array([10.0, 0.0, 100.0, 100.0])
+        minimum_stock = np.array([5.0, 3.0, 0.0, 0.0])
+
+        velocity, units, days_left, suggested = forecast(sales, 0, stock, minimum_stock, horizon=14)
+
+        np.testing.assert_allclose(velocity[:3], [2, 0, 1])
+        np.testing.assert_allclose(units[:3], [28, 0, 14])
+        np.testing.assert_allclose(days_left[:3], [5, 0, 100])
+        np.testing.assert_allclose(suggested[:3], [23, 3, 0])
+
+        # Monday demand is weighted 4x, other days 0.5x: 2 x 4 + 12 x 0.5 = 14 velocity-days
+        self.assertAlmostEqual(velocity[3], 0.58286, places=4)
+        self.assertAlmostEqual(units[3], velocity[3] * 14)
+        self.assertGreater(days_left[3], 14)
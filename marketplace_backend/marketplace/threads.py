@@ -0,0 +1,13 @@
+from django.db import connection
+
+
+def run_in_thread(func, *args):
+    """
+    Call ``func(*args)`` on a pool thread, then close the thread's database
+    connection: each pool thread holds its own, and nothing else would
+    close it when the thread is done with it.
+    """
+    try:
+        return func(*args)
+    finally:
+        connection.close()
@@ -6,14 +6,22 @@ from . import views
 urlpatterns = [
     path("add_product/", views.add_product, name="add_product"),
     path("generate_product_description/", views.generate_product_description, name="generate_product_description"),
+    path("submit_generation_job/", views.submit_generation_job, name="submit_generation_job"),
+    path("generation_job/<uuid:pk>/", views.get_generation_job, name="generation_job"),
+    path("llm_metrics/", views.get_llm_metrics, name="llm_metrics"),
+    path("stream_product_description/", views.stream_product_description, name="stream_product_description"),
+    path("generate_product_descriptions/", views.generate_product_descriptions, name="generate_product_descriptions"),
     path("get_products/", views.get_products, name="get_products"),
     path("get_product/<int:pk>/", views.get_product, name='get_product'),
     path("update_product/<int:pk>/", views.update_product, name="update_product"),
+    path("staged_image/<uuid:pk>/", views.get_staged_image, name="get_staged_image"),
     path("delete_product/<int:pk>/", views.delete_product, name="delete_product"),
     path("get_featured_products/", views.get_featured_products, name="get_featured_products"),
     path("get_all_products/", views.get_all_products, name="get_all_products"),
     path("get_product_by_slug/<str:slug>/", views.get_product_by_slug, name='get_product_by_slug'),
+    path("similar/<int:pk>/", views.get_similar_products, name="similar_products"),
     path("get_cart/<str:cart_code>/", views.get_cart, name="get_cart"),
+    path("frequently_bought_together/", views.get_frequently_bought_together, name="frequently_bought_together"),
     path("add_to_cart/", views.add_to_cart, name="add_to_cart"),
     path("check_product_in_cart/", views.check_product_in_cart, name='check_product_in_cart'),
     path("increase_cartitem_quantity/", views.increase_cartitem_quantity, name='increase_cartitem_quantity'),
@@ -23,12 +31,18 @@ urlpatterns = [
     path('initialize_payment/', views.initialize_payment, name='initialize_payment'),
     path('verify_payment/<str:reference>/', views.verify_payment, name='verify-payment'),
     path('get_shipping_address/', views.get_shipping_address, name='get_shipping_address'),
+    path("track_event/", views.track_event, name="track_event"),
     path("analytics/", views.get_analytics_data, name="analytics-data"),
     path("dashboard-stats/", views.admin_dashboard_stats, name="admin-dashboard-stats"),
+    path("low_stock_products/", views.get_low_stock_products, name="low_stock_products"),
+    path("restock_suggestions/", views.get_restock_suggestions, name="restock_suggestions"),
     path("get_user_orders/", views.get_user_orders, name="get_user_orders"),
     path("get_all_orders/", views.get_all_orders, name='get_all_orders'),
+    path("export_orders/", views.export_orders, name="export_orders"),
     path("update_order_status/<int:pk>/", views.update_order_status, name='update_order_status'),
+    path("bulk_update_order_status/", views.bulk_update_order_status, name="bulk_update_order_status"),
     path("delete_order/<int:pk>/", views.delete_order, name="delete_order"),
     path("user_is_admin/", views.user_is_admin, name="user_is_admin"),
-    path("user_is_logged_in/", views.user_is_logged_in, name='user_is_logged_in')
+    path("user_is_logged_in/", views.user_is_logged_in, name='user_is_logged_in'),
+    path("batch/", views.batch_requests, name="batch_requests"),
 ]
\ No newline at end of file
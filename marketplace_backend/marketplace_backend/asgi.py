@@ -2,6 +2,10 @@
 ASGI config for marketplace_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Run it with uvicorn workers so streaming responses such as
+stream_product_description are served without tying up a worker thread:
+
+    gunicorn marketplace_backend.asgi:application -k uvicorn.workers.UvicornWorker
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
@@ -147,6 +147,12 @@ cloudinary.config(
 DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 
 MEDIA_URL = "/media/"
+MEDIA_ROOT = BASE_DIR / "media"
+
+# Where product images are stored: "cloudinary", or "local" to keep them and
+# their resized variants under MEDIA_ROOT (development, tests and benchmarks
+# only; nothing serves MEDIA_URL with DEBUG off)
+MEDIA_BACKEND = os.getenv("MEDIA_BACKEND", "cloudinary")
 
 
 AUTH_USER_MODEL = 'core.CustomUser'
@@ -154,6 +160,77 @@ AUTH_USER_MODEL = 'core.CustomUser'
 GEMINI_API_KEY=os.getenv("GEMINI_API_KEY")
 PAYSTACK_SECRET_KEY=os.getenv("PAYSTACK_SECRET_KEY")
 
+# AI backend for product descriptions: "gemini", "openai" or "stub" (offline
+# and deterministic), the model each hosted backend uses, and the simulated
+# latency (seconds) of the stub
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+LLM_STUB_DELAY = float(os.getenv("LLM_STUB_DELAY", 0))
+
+# Model call limits: deadline per call (seconds), calls in flight per process
+# and how long (seconds) a call may wait for a free slot, and the circuit
+# breaker's consecutive failure threshold and cool-off (seconds)
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 20))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", 1))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", 5))
+LLM_BREAKER_RESET = int(os.getenv("LLM_BREAKER_RESET", 30))
+
+# AI generation job queue: jobs each run_generation_worker runs at once,
+# attempts before a job fails, first retry delay (seconds, doubling each
+# attempt) and how long (seconds) a running job may go without a heartbeat
+# from its worker before it is requeued
+GENERATION_JOB_WORKERS = int(os.getenv("GENERATION_JOB_WORKERS", 4))
+GENERATION_JOB_MAX_ATTEMPTS = int(os.getenv("GENERATION_JOB_MAX_ATTEMPTS", 3))
+GENERATION_JOB_RETRY_DELAY = int(os.getenv("GENERATION_JOB_RETRY_DELAY", 10))
+GENERATION_JOB_STALE_AFTER = int(os.getenv("GENERATION_JOB_STALE_AFTER", 180))
+
+# How long (days) and how many generated descriptions are kept for reuse
+DESCRIPTION_CACHE_TTL_DAYS = int(os.getenv("DESCRIPTION_CACHE_TTL_DAYS", 30))
+DESCRIPTION_CACHE_MAX_ENTRIES = int(os.getenv("DESCRIPTION_CACHE_MAX_ENTRIES", 5000))
+# Model calls in flight at once when generating descriptions in bulk
+DESCRIPTION_BATCH_WORKERS = int(os.getenv("DESCRIPTION_BATCH_WORKERS", 8))
+
+# Shared cache for token revocations, throttle buckets and dashboard figures.
+# Without REDIS_URL each process keeps its own, and token claims are not
+# trusted (core.authentication falls back to loading the user).
+REDIS_URL = os.getenv("REDIS_URL")
+CACHES = {
+    "default": (
+        {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": REDIS_URL}
+        if REDIS_URL else {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    ),
+}
+
+# Request throttling: a token bucket per user (or IP when signed out) for each
+# endpoint class, as "<requests>/<second|minute|hour|day>" (empty for no
+# limit). THROTTLE_STORE is "local" (per process) or "cache" to share the
+# buckets through the Django cache
+THROTTLE_STORE = os.getenv("THROTTLE_STORE", "local")
+THROTTLE_RATES = {
+    "auth": os.getenv("THROTTLE_AUTH_RATE", "10/minute"),
+    "ai": os.getenv("THROTTLE_AI_RATE", "20/minute"),
+    "search": os.getenv("THROTTLE_SEARCH_RATE", "120/minute"),
+    "checkout": os.getenv("THROTTLE_CHECKOUT_RATE", "30/minute"),
+}
+
+# Sub-requests of one /batch/ call run at once, each on its own DB connection
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", 4))
+
+# Seconds the admin dashboard figures are cached for
+DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", 30))
+
+# Storefront event tracking: fraction of events kept, and how often each
+# worker flushes its buffered counts (seconds) or after how many distinct keys
+EVENT_SAMPLE_RATE = float(os.getenv("EVENT_SAMPLE_RATE", 1.0))
+EVENT_FLUSH_INTERVAL = int(os.getenv("EVENT_FLUSH_INTERVAL", 10))
+EVENT_BUFFER_MAX_KEYS = int(os.getenv("EVENT_BUFFER_MAX_KEYS", 1000))
+
+# Delivered/failed orders older than this move to the archive tables
+ORDER_ARCHIVE_AFTER_DAYS = int(os.getenv("ORDER_ARCHIVE_AFTER_DAYS", 90))
+
 AUTH_USER_MODEL = 'core.CustomUser'
 
 SIMPLE_JWT = {
@@ -162,8 +239,14 @@ SIMPLE_JWT = {
 }
 
 
+# Reverse proxies in front of the app. Signed-out clients are throttled by
+# the address the last of them saw; with 0, X-Forwarded-For is ignored, as
+# any client can set it. Render (which sets RENDER) runs one proxy.
+NUM_PROXIES = int(os.getenv("NUM_PROXIES", 1 if os.getenv("RENDER") else 0))
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+    ),
+    'NUM_PROXIES': NUM_PROXIES,
 }
@@ -134,11 +134,11 @@ const OrderHistoryPage = () => {
                           <div>
                             <p className="font-medium">{item.product.name}</p>
                             <p className="text-sm text-muted-foreground">
-                              Quantity: {item.quantity} × {formatPrice(item.product.price)}
+                              Quantity: {item.quantity} × {formatPrice(item.unit_price)}
                             </p>
                           </div>
                           <p className="font-medium">
-                            {formatPrice(item.quantity * item.product.price)}
+                            {formatPrice(item.line_total)}
                           </p>
                         </div>
                       ))}
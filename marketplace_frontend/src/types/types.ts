@@ -31,7 +31,9 @@ export interface ICart{
 export interface IOrderitems{
     id: number;
     product: IProduct;
-    quantity: number
+    quantity: number;
+    unit_price: number;
+    line_total: number
 }
 
 